@@ -1,15 +1,205 @@
 #!/usr/bin/env python
 """Backup files specified in "backups" file to a specified directory or a
 default directory (the user's Documents/my-backups).
+
+Files backed up are recorded in a manifest in the backup directory, so later
+runs only copy files changed since: files whose size, modification time and
+inode are unchanged are skipped after one stat, contents only hashed if size
+is unchanged but the others changed. Files deleted since are recorded in the
+manifest, their copies deleted with --delete.
+
+Examples:
+    `python3 backup.py` backs up items to ~/Documents/my-backups
+
+    `python3 backup.py /mnt/backups --delete` backs up items to /mnt/backups,
+    deleting copies of files deleted since the last backup
+
+    `python3 backup.py --stats` also prints the files and bytes backed up,
+    the number of directories listed and files stat-ed, which grow linearly
+    with the size of the tree, and the time spent finding, comparing,
+    copying and flushing (with --fsync) files. `--stats-json stats.json`
+    writes the same as JSON
+
+    `python3 backup.py -n` prints the files that would be copied and the
+    bytes to copy, without backing up. `-p` shows progress while copying
+
+    `python3 backup.py -j 16 --large-jobs 4 --device-jobs 12` copies files
+    under 8 MiB in 16 threads and larger files in 4, at most 12 at once from
+    each source device
+
+    `python3 backup.py -s /mnt/backups` backs up items to a new snapshot in
+    /mnt/backups/snapshots named by date, made of hardlinks to file contents
+    stored once in /mnt/backups/objects by blake2b hash, so files unchanged
+    since the last snapshot are linked without being read
+
+    `python3 backup.py -a tar /mnt/backups` streams items into a new archive
+    /mnt/backups/backup-<date>.tar.gz without copying them first, compressing
+    blocks of it on all cores; `-a zip` writes a .zip archive the same way
 """
 
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import errno
+import gzip
+import hashlib
+import io
+import json
 import os
 import pwd
-import subprocess
+import shutil
+import stat
 import sys
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
 
 BACKUP_DESTINATION = ""
+BACKUP_DESTINATION_ARG = ""
 ITEMS_TO_BACKUP = "./backups"
+COPY_BLOCK_SIZE = 8 * 1024 * 1024
+MANIFEST_NAME = ".backup-manifest.json"
+MANIFEST_PATH_ARG = ""
+MANIFEST = {"files": {}, "deleted": {}}
+FILES_SEEN = set()
+# Items, directories, files that could not be read this run: files recorded
+# under them are not taken as deleted
+PATHS_FAILED = set()
+DELETE_COPIES = False
+PRINT_STATS = False
+FILE_STATS_JSON = ""
+DRY_RUN = False
+PROGRESS = False
+FSYNC = False
+# Directories listed, files stat-ed while planning backup
+WALK_COUNTERS = {"listdir": 0, "stat": 0}
+# Files, bytes backed up, seconds spent in each phase of backup
+BACKUP_COUNTERS = {"files_copied": 0, "files_failed": 0, "files_skipped": 0,
+                   "files_linked": 0, "bytes_copied": 0}
+PHASE_SECONDS = {"discovery": 0.0, "comparison": 0.0, "copy": 0.0,
+                 "fsync": 0.0}
+PROGRESS_INTERVAL = 0.5
+PROGRESS_TIME_NEXT = 0.0
+# Threads copying files smaller, larger than LARGE_FILE_SIZE, copies at once
+# from each source device
+JOBS_SMALL = 8
+JOBS_LARGE = 2
+JOBS_DEVICE = 8
+LARGE_FILE_SIZE = 8 * 1024 * 1024
+# Types of files backed up besides directories: FIFOs, devices recreated
+# rather than read, others (sockets) skipped
+FILE_TYPES_BACKED_UP = (stat.S_IFREG, stat.S_IFLNK, stat.S_IFIFO,
+                        stat.S_IFCHR, stat.S_IFBLK)
+# Snapshots: dated trees of hardlinks into store of contents by hash
+SNAPSHOT = False
+SNAPSHOTS_DIR_NAME = "snapshots"
+OBJECTS_DIR_NAME = "objects"
+OBJECTS_DIR = ""
+SNAPSHOT_MANIFEST_NAME = ".snapshot-manifest.json"
+SNAPSHOT_FILES = {}
+# Archives: blocks compressed at once in threads, one per core, blocks
+# compressed ahead of writing to keep memory bounded
+ARCHIVE_FORMAT = ""
+ARCHIVE_SUFFIXES = {"tar": ".tar.gz", "zip": ".zip"}
+ARCHIVE_BLOCK_SIZE = 1024 * 1024
+ARCHIVE_BLOCKS_PENDING = 4 * (os.cpu_count() or 1)
+ARCHIVE_COMPRESS_LEVEL = 6
+# Final empty block ending raw deflate streams of blocks compressed apart
+DEFLATE_END = zlib.compressobj(ARCHIVE_COMPRESS_LEVEL, zlib.DEFLATED,
+                               -zlib.MAX_WBITS).flush()
+# Whether zipfile's member writers write blocks deflated apart, None until
+# checked
+ZIP_DEFLATED_BLOCKS = None
+
+
+"""Setup."""
+
+
+def _get_flag_arguments():
+    global BACKUP_DESTINATION_ARG
+    global MANIFEST_PATH_ARG
+    global DELETE_COPIES
+    global PRINT_STATS
+    global JOBS_SMALL
+    global JOBS_LARGE
+    global JOBS_DEVICE
+    global SNAPSHOT
+    global ARCHIVE_FORMAT
+    global FILE_STATS_JSON
+    global DRY_RUN
+    global PROGRESS
+    global FSYNC
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("destination", nargs="?",
+                        help="directory to back up to "
+                             "(default: ~/Documents/my-backups)")
+    parser.add_argument("--manifest", type=str,
+                        help="file to keep manifest of backed up files in "
+                             f"(default: {MANIFEST_NAME} in destination)")
+    parser.add_argument("--delete", action="store_true",
+                        help="delete copies of files deleted since last "
+                             "backup")
+    parser.add_argument("--stats", action="store_true",
+                        help="print files, bytes backed up, directories "
+                             "listed, files stat-ed and time spent in each "
+                             "phase of backup")
+    parser.add_argument("--stats-json", type=str,
+                        help="write --stats report as JSON to this file")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="print files that would be copied, with their "
+                             "sizes, without backing up")
+    parser.add_argument("-p", "--progress", action="store_true",
+                        help="show files, bytes copied so far while copying")
+    parser.add_argument("--fsync", action="store_true",
+                        help="flush files copied to disk before finishing")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="number of threads copying files under "
+                             f"{LARGE_FILE_SIZE // (1024 * 1024)} MiB "
+                             f"(default: {JOBS_SMALL})")
+    parser.add_argument("--large-jobs", type=int,
+                        help="number of threads copying larger files "
+                             f"(default: {JOBS_LARGE})")
+    parser.add_argument("--device-jobs", type=int,
+                        help="most files copied at once from each source "
+                             f"device (default: {JOBS_DEVICE})")
+    parser.add_argument("-s", "--snapshot", action="store_true",
+                        help="back up to new dated snapshot, storing each "
+                             "file's contents once across snapshots")
+    parser.add_argument("-a", "--archive", choices=ARCHIVE_SUFFIXES,
+                        help="back up to new dated compressed archive of "
+                             "this format instead of a directory")
+    args = parser.parse_args()
+
+    if args.destination:
+        BACKUP_DESTINATION_ARG = args.destination
+    if args.manifest:
+        MANIFEST_PATH_ARG = args.manifest
+    if args.delete:
+        DELETE_COPIES = args.delete
+    if args.stats:
+        PRINT_STATS = args.stats
+    if args.jobs:
+        JOBS_SMALL = max(args.jobs, 1)
+    if args.large_jobs:
+        JOBS_LARGE = max(args.large_jobs, 1)
+    if args.device_jobs:
+        JOBS_DEVICE = max(args.device_jobs, 1)
+    if args.snapshot:
+        SNAPSHOT = args.snapshot
+    if args.archive:
+        ARCHIVE_FORMAT = args.archive
+    if args.stats_json:
+        FILE_STATS_JSON = args.stats_json
+    if args.dry_run:
+        DRY_RUN = args.dry_run
+    if args.progress:
+        PROGRESS = args.progress
+    if args.fsync:
+        FSYNC = args.fsync
 
 
 """Backup destination setup."""
@@ -17,8 +207,8 @@ ITEMS_TO_BACKUP = "./backups"
 
 def _select_backup_dir():
     # Return user-specified backup directory or default if none provided.
-    if len(sys.argv) > 1:
-        return _replace_rel_with_abs_path(sys.argv[1])
+    if BACKUP_DESTINATION_ARG:
+        return _replace_rel_with_abs_path(BACKUP_DESTINATION_ARG)
     return f"/home/{_get_system_username()}/Documents/my-backups"
 
 
@@ -29,7 +219,7 @@ def _get_system_username():
 
 def _get_backup_dir(destination):
     # Return backup directory - and create if it doesn't exist.
-    if not os.path.isdir(os.path.abspath(destination)):
+    if not os.path.isdir(os.path.abspath(destination)) and not DRY_RUN:
         os.makedirs(os.path.abspath(destination))
     return f"{destination}/"
 
@@ -60,60 +250,796 @@ def _update_paths(to_backup):
 """"Backup functionality."""
 
 
-def _file_or_dir_exists(path):
-    # Returns whether the specified file or directory exists or not
-    if os.path.isdir(os.path.abspath(path)) or \
-            os.path.isfile(os.path.abspath(path)):
-        return True
-    return False
+def _copy_items(items, destination):
+    # Main routine for backing up all files, directories in items: plan copies
+    # in a single walk of items, then copy
+    time_start = time.perf_counter()
+    plan = _get_backup_plan(items, destination)
+    # Planning time not spent comparing files is spent finding them
+    PHASE_SECONDS["discovery"] += \
+        time.perf_counter() - time_start - PHASE_SECONDS["comparison"]
+    BACKUP_COUNTERS["files_skipped"] += plan["skipped"]
+    if DRY_RUN:
+        _print_backup_plan(plan)
+        return
+    time_start = time.perf_counter()
+    if ARCHIVE_FORMAT:
+        _write_archive(plan, destination)
+    else:
+        _execute_backup_plan(plan)
+    PHASE_SECONDS["copy"] += \
+        time.perf_counter() - time_start - PHASE_SECONDS["fsync"]
 
 
-def _copy_items(items, destination):
-    # Main routine for backing up all files, directories in items
+def _get_backup_plan(items, destination):
+    # Return directories to create, files to copy into destination, number
+    # of files skipped as unchanged
+    plan = {"dirs": [], "files": [], "skipped": 0}
     for source in items:
-        if os.path.isfile(source):
-            subprocess.run(f"cp -r {source} {destination}", shell=True)
-            if _source_destination_files_different(
-                    source, f"{destination}"):
-                subprocess.run(f"cp -r {source} {destination}", shell=True)
+        source = os.path.abspath(source)
+        try:
+            WALK_COUNTERS["stat"] += 1
+            source_stat = os.lstat(source)
+        except OSError as error:
+            PATHS_FAILED.add(source)
+            print(f"Could not back up {source}: {error}")
+            continue
+        destination_path = os.path.join(destination, os.path.basename(source))
+        if stat.S_ISDIR(source_stat.st_mode):
+            walk_dir(source, destination_path, plan)
         else:
-            dir_name = source.split("/")[-1]
-            substring_path = destination.split(BACKUP_DESTINATION)
-            if _must_append_dir_name_to_path(substring_path, destination):
-                dir_destination = f"{destination}{dir_name}"
-            else:
-                dir_destination = destination
-            if not os.path.isdir(dir_destination):
-                subprocess.run(f"cp -r {source} {dir_destination}", shell=True)
-            else:
-                walk_dir(source, dir_destination)
-
-
-def _source_destination_files_different(source_file, destination_file):
-    # Compare if file/directory does not exist or if files are different sizes
-    if not _file_or_dir_exists(destination_file):
+            _plan_file(source, destination_path, source_stat, plan, False)
+    return plan
+
+
+def walk_dir(source, destination, plan):
+    # Add directories, changed files in source tree to plan, listing each
+    # directory once and stat-ing each file once
+    WALK_COUNTERS["stat"] += 1
+    destination_new = not os.path.isdir(destination)
+    dirs = [(source, destination)]
+    while dirs:
+        source_dir, destination_dir = dirs.pop()
+        plan["dirs"].append((source_dir, destination_dir))
+        try:
+            WALK_COUNTERS["listdir"] += 1
+            with os.scandir(source_dir) as dir_entries:
+                entries = list(dir_entries)
+        except OSError as error:
+            PATHS_FAILED.add(source_dir)
+            print(f"Could not back up {source_dir}: {error}")
+            continue
+        for entry in entries:
+            destination_path = os.path.join(destination_dir, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append((entry.path, destination_path))
+                continue
+            try:
+                WALK_COUNTERS["stat"] += 1
+                entry_stat = entry.stat(follow_symlinks=False)
+            except OSError as error:
+                PATHS_FAILED.add(entry.path)
+                print(f"Could not back up {entry.path}: {error}")
+                continue
+            _plan_file(entry.path, destination_path, entry_stat, plan,
+                       destination_new)
+
+
+def _plan_file(source_file, destination_file, source_stat, plan,
+               destination_new):
+    # Add file to plan's copies if changed since its last backup, or its
+    # destination tree is new
+    FILES_SEEN.add(source_file)
+    if stat.S_IFMT(source_stat.st_mode) not in FILE_TYPES_BACKED_UP:
+        print(f"Not backing up {source_file}: socket or other special file")
+        return
+    if destination_new:
+        plan["files"].append((source_file, destination_file, source_stat))
+        return
+    time_start = time.perf_counter()
+    if _source_destination_files_different(source_file, destination_file,
+                                           source_stat):
+        plan["files"].append((source_file, destination_file, source_stat))
+    else:
+        plan["skipped"] += 1
+    PHASE_SECONDS["comparison"] += time.perf_counter() - time_start
+
+
+def _execute_backup_plan(plan):
+    # Create plan's directories, parents first, then copy files in threads,
+    # recording them in manifest and reporting errors in plan order
+    dirs_changed = set()
+    for source_dir, destination_dir in plan["dirs"]:
+        try:
+            os.mkdir(destination_dir)
+            dirs_changed.add(destination_dir)
+        except FileExistsError:
+            pass
+    # Small files are bound by per-file overhead, large by bandwidth: copy
+    # in separate pools so large files don't hold up small ones
+    device_semaphores = {}
+    copy_file = _snapshot_file if SNAPSHOT else _copy_file
+    with ThreadPoolExecutor(max_workers=JOBS_SMALL) as copier_small, \
+            ThreadPoolExecutor(max_workers=JOBS_LARGE) as copier_large:
+        copies = []
+        for source_file, destination_file, source_stat in plan["files"]:
+            device_semaphore = device_semaphores.setdefault(
+                source_stat.st_dev, threading.BoundedSemaphore(JOBS_DEVICE))
+            copier = copier_large \
+                if source_stat.st_size >= LARGE_FILE_SIZE else copier_small
+            copies.append(copier.submit(
+                _copy_file_limited, copy_file, source_file, destination_file,
+                source_stat, device_semaphore))
+        for (source_file, destination_file, source_stat), copy in \
+                zip(plan["files"], copies):
+            result, error = copy.result()
+            if error is not None:
+                BACKUP_COUNTERS["files_failed"] += 1
+                print(f"Could not copy {source_file} to {destination_file}: "
+                      f"{error}")
+                continue
+            content_hash, stored = result if SNAPSHOT else (None, True)
+            _count_file_copied(source_stat, len(plan["files"]),
+                               linked=not stored)
+            _record_file(source_file, destination_file, source_stat,
+                         content_hash)
+            if SNAPSHOT:
+                _record_snapshot_file(destination_file, source_stat,
+                                      content_hash)
+            dirs_changed.add(os.path.dirname(destination_file))
+        if FSYNC:
+            time_start = time.perf_counter()
+            # Wait for all flushes, so errors are reported
+            list(copier_small.map(_fsync_path, [
+                destination_file for _, destination_file, source_stat
+                in plan["files"]
+                if stat.S_ISREG(source_stat.st_mode)]))
+    # Set times of directories copied into last, as copying changes them
+    for source_dir, destination_dir in reversed(plan["dirs"]):
+        if destination_dir in dirs_changed:
+            shutil.copystat(source_dir, destination_dir)
+    if FSYNC:
+        for destination_dir in dirs_changed:
+            _fsync_path(destination_dir)
+        PHASE_SECONDS["fsync"] += time.perf_counter() - time_start
+
+
+def _fsync_path(path):
+    # Flush file or directory to disk
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as error:
+        print(f"Could not flush {path} to disk: {error}")
+
+
+def _source_destination_files_different(source_file, destination_file,
+                                        source_stat):
+    # Compare file with manifest's record of its last backup, else with
+    # destination file. Hash contents only if same size but modified or
+    # replaced since
+    record = MANIFEST["files"].get(source_file)
+    if record is None or record["destination"] != destination_file:
+        try:
+            WALK_COUNTERS["stat"] += 1
+            destination_stat = os.lstat(destination_file)
+        except FileNotFoundError:
+            return True
+        if stat.S_ISDIR(destination_stat.st_mode):
+            return False
+        record = {"destination": destination_file,
+                  "size": destination_stat.st_size,
+                  "mtime_ns": None, "inode": None}
+    if source_stat.st_size != record["size"]:
         return True
-    return os.path.getsize(source_file) != os.path.getsize(destination_file) \
-           and not os.path.isdir(destination_file)
+    if source_stat.st_mtime_ns == record["mtime_ns"] and \
+            source_stat.st_ino == record["inode"]:
+        return False
+    if not stat.S_ISREG(source_stat.st_mode) or \
+            not os.path.isfile(destination_file):
+        return True
+    content_hash = _get_content_hash(source_file)
+    if content_hash != (record.get("hash") or
+                        _get_content_hash(destination_file)):
+        return True
+    # Same contents: keep new times, inode so file is skipped next time
+    _record_file(source_file, destination_file, source_stat, content_hash)
+    return False
+
+
+"""Copy engine."""
+
+
+def _copy_file_limited(copy_file, source_file, destination_file,
+                       source_stat, device_semaphore):
+    # Copy file with copy_file once its source device has a copy slot free.
+    # Return copy_file's result, if any, and error copying, if any
+    with device_semaphore:
+        try:
+            return copy_file(source_file, destination_file, source_stat), None
+        except OSError as error:
+            return None, error
+
+
+def _copy_file(source_file, destination_file, source_stat):
+    # Copy file in kernel with its permissions, times, or symlink as symlink,
+    # FIFO or device as new FIFO or device
+    if stat.S_ISLNK(source_stat.st_mode):
+        if os.path.lexists(destination_file):
+            os.unlink(destination_file)
+        os.symlink(os.readlink(source_file), destination_file)
+        return
+    if stat.S_ISREG(source_stat.st_mode):
+        _copy_file_contents(source_file, destination_file)
+    else:
+        _make_special_file(destination_file, source_stat)
+    shutil.copystat(source_file, destination_file)
+
+
+def _make_special_file(destination_file, source_stat):
+    # Create FIFO or device file like source, as cp -r does, as reading it
+    # would block or read the device
+    if os.path.lexists(destination_file):
+        os.unlink(destination_file)
+    if stat.S_ISFIFO(source_stat.st_mode):
+        os.mkfifo(destination_file, stat.S_IMODE(source_stat.st_mode))
+    else:
+        os.mknod(destination_file, source_stat.st_mode, source_stat.st_rdev)
+
+
+def _copy_file_contents(source_file, destination_file):
+    # Copy file contents without reading them into Python, falling back to
+    # buffered copy if kernel copies unsupported between files
+    with open(source_file, "rb") as source, \
+            open(destination_file, "wb") as destination:
+        for copy_range in (os.copy_file_range, _sendfile):
+            try:
+                while copy_range(source.fileno(), destination.fileno(),
+                                 COPY_BLOCK_SIZE):
+                    pass
+                return
+            except OSError:
+                # Restart with next method
+                source.seek(0)
+                destination.seek(0)
+                destination.truncate()
+        shutil.copyfileobj(source, destination, COPY_BLOCK_SIZE)
+
+
+def _sendfile(source_fd, destination_fd, count):
+    # Copy count bytes from source's position, advancing it, like
+    # os.copy_file_range
+    offset = os.lseek(source_fd, 0, os.SEEK_CUR)
+    copied = os.sendfile(destination_fd, source_fd, offset, count)
+    os.lseek(source_fd, offset + copied, os.SEEK_SET)
+    return copied
+
+
+"""Snapshot store."""
+
+
+def _start_snapshot(backup_dir):
+    # Return new snapshot directory named by date, creating object store
+    global OBJECTS_DIR
+    OBJECTS_DIR = os.path.join(backup_dir, OBJECTS_DIR_NAME)
+    os.makedirs(OBJECTS_DIR, exist_ok=True)
+    snapshot_dir = _get_snapshot_dir(backup_dir)
+    os.makedirs(os.path.dirname(snapshot_dir.rstrip("/")), exist_ok=True)
+    os.mkdir(snapshot_dir)
+    return snapshot_dir
+
+
+def _get_snapshot_dir(backup_dir):
+    # Return path of new snapshot directory named by date, not created
+    snapshot_name = datetime.now().strftime("%Y-%m-%dT%H%M%S")
+    return os.path.join(backup_dir, SNAPSHOTS_DIR_NAME, snapshot_name) + "/"
+
+
+def _snapshot_file(source_file, destination_file, source_stat):
+    # Hardlink file's contents from object store into snapshot, storing them
+    # first if changed since last backup. Return content hash, and whether
+    # contents were read into store rather than only linked
+    if stat.S_ISLNK(source_stat.st_mode):
+        os.symlink(os.readlink(source_file), destination_file)
+        return None, True
+    if not stat.S_ISREG(source_stat.st_mode):
+        _make_special_file(destination_file, source_stat)
+        shutil.copystat(source_file, destination_file)
+        return None, True
+    record = MANIFEST["files"].get(source_file)
+    stored = False
+    if record is not None and record.get("hash") and \
+            source_stat.st_size == record["size"] and \
+            source_stat.st_mtime_ns == record["mtime_ns"] and \
+            source_stat.st_ino == record["inode"] and \
+            os.path.isfile(_get_object_path(record["hash"])):
+        content_hash = record["hash"]
+    else:
+        content_hash = _store_object(source_file, source_stat)
+        stored = True
+    object_path = _get_object_path(content_hash)
+    try:
+        os.link(object_path, destination_file)
+    except OSError as error:
+        # Copy object if it has as many links as filesystem allows
+        if error.errno != errno.EMLINK:
+            raise
+        _copy_file_contents(object_path, destination_file)
+        shutil.copystat(object_path, destination_file)
+    return content_hash, stored
+
+
+def _store_object(source_file, source_stat):
+    # Copy file into object store under hash of its contents, hashing while
+    # copying, keeping existing object if contents already stored. Return
+    # content hash
+    content_hash = hashlib.blake2b()
+    object_path_tmp = os.path.join(OBJECTS_DIR,
+                                   f"tmp-{threading.get_ident()}")
+    with open(source_file, "rb") as source, \
+            open(object_path_tmp, "wb") as object_file:
+        while block := source.read(COPY_BLOCK_SIZE):
+            content_hash.update(block)
+            object_file.write(block)
+    content_hash = content_hash.hexdigest()
+    object_path = _get_object_path(content_hash)
+    if os.path.isfile(object_path):
+        os.unlink(object_path_tmp)
+        return content_hash
+    os.chmod(object_path_tmp, stat.S_IMODE(source_stat.st_mode))
+    os.utime(object_path_tmp,
+             ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    os.replace(object_path_tmp, object_path)
+    return content_hash
+
+
+def _get_object_path(content_hash):
+    # Return path of contents in object store, in directory by first byte
+    return os.path.join(OBJECTS_DIR, content_hash[:2], content_hash[2:])
+
+
+def _record_snapshot_file(destination_file, source_stat, content_hash):
+    # Record file's hash, mode, time in snapshot: hardlinks share the mode,
+    # time of the object's first file
+    SNAPSHOT_FILES[destination_file] = {
+        "hash": content_hash, "mode": stat.S_IMODE(source_stat.st_mode),
+        "mtime_ns": source_stat.st_mtime_ns}
+
+
+def _save_snapshot_manifest(snapshot_dir):
+    # Write snapshot's files with paths relative to snapshot
+    snapshot_files = {os.path.relpath(path, snapshot_dir): record
+                      for path, record in SNAPSHOT_FILES.items()}
+    _save_manifest(snapshot_files,
+                   os.path.join(snapshot_dir, SNAPSHOT_MANIFEST_NAME))
+
+
+"""Archives."""
+
+
+def _get_archive_base_dir(backup_dir):
+    # Return directory archive's paths are relative to, named by date, not
+    # created so all files are planned
+    archive_name = datetime.now().strftime("backup-%Y-%m-%dT%H%M%S")
+    return os.path.join(backup_dir, archive_name) + "/"
+
+
+def _write_archive(plan, base_dir):
+    # Stream plan's directories, files into archive named after base_dir,
+    # compressing blocks in threads
+    archive_path = base_dir.rstrip("/") + ARCHIVE_SUFFIXES[ARCHIVE_FORMAT]
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as compressor, \
+            open(archive_path, "wb") as archive_file:
+        if ARCHIVE_FORMAT == "tar":
+            _write_tar_archive(plan, base_dir, archive_file, compressor)
+        else:
+            _write_zip_archive(plan, base_dir, archive_file, compressor)
+    print(f"Archive saved to {archive_path}")
+
+
+def _write_tar_archive(plan, base_dir, archive_file, compressor):
+    # Write tar stream as gzip members of ARCHIVE_BLOCK_SIZE compressed in
+    # parallel, which gzip readers read as one stream
+    gzip_writer = _ParallelGzipWriter(archive_file, compressor)
+    with tarfile.open(fileobj=gzip_writer, mode="w|") as tar:
+        for source_dir, destination_dir in plan["dirs"]:
+            try:
+                tar.addfile(tar.gettarinfo(
+                    source_dir, os.path.relpath(destination_dir, base_dir)))
+            except OSError as error:
+                print(f"Could not archive {source_dir}: {error}")
+        for source_file, destination_file, source_stat in plan["files"]:
+            arcname = os.path.relpath(destination_file, base_dir)
+            try:
+                if stat.S_ISREG(source_stat.st_mode):
+                    with open(source_file, "rb") as file:
+                        tar.addfile(tar.gettarinfo(arcname=arcname,
+                                                   fileobj=file), file)
+                else:
+                    tar.addfile(tar.gettarinfo(source_file, arcname))
+                _count_file_copied(source_stat, len(plan["files"]))
+            except OSError as error:
+                BACKUP_COUNTERS["files_failed"] += 1
+                print(f"Could not archive {source_file}: {error}")
+    gzip_writer.close()
+
+
+class _ParallelGzipWriter:
+    """Write-only file compressing blocks written to it into gzip members in
+    threads, writing them to file in order"""
+
+    def __init__(self, file, compressor):
+        self.file = file
+        self.compressor = compressor
+        self.buffer = bytearray()
+        self.blocks_pending = deque()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= ARCHIVE_BLOCK_SIZE:
+            self._compress_block(bytes(self.buffer[:ARCHIVE_BLOCK_SIZE]))
+            del self.buffer[:ARCHIVE_BLOCK_SIZE]
+        return len(data)
+
+    def close(self):
+        if self.buffer:
+            self._compress_block(bytes(self.buffer))
+            self.buffer.clear()
+        while self.blocks_pending:
+            self.file.write(self.blocks_pending.popleft().result())
+
+    def _compress_block(self, block):
+        self.blocks_pending.append(self.compressor.submit(
+            gzip.compress, block, ARCHIVE_COMPRESS_LEVEL, mtime=0))
+        if len(self.blocks_pending) > ARCHIVE_BLOCKS_PENDING:
+            self.file.write(self.blocks_pending.popleft().result())
+
+
+def _write_zip_archive(plan, base_dir, archive_file, compressor):
+    # Write zip members with contents deflated in blocks in parallel, across
+    # files, written through member writers of zipfile. Deflated by zipfile
+    # instead if its member writers can't write blocks deflated apart
+    if not _can_write_deflated_blocks():
+        print("Compressing zip archive in one thread: this Python's zipfile "
+              "can't write blocks compressed in parallel")
+        compressor = None
+    with zipfile.ZipFile(archive_file, "w", zipfile.ZIP_DEFLATED,
+                         strict_timestamps=False) as archive:
+        for source_dir, destination_dir in plan["dirs"]:
+            try:
+                archive.write(source_dir,
+                              os.path.relpath(destination_dir, base_dir))
+            except OSError as error:
+                print(f"Could not archive {source_dir}: {error}")
+        files_total = len(plan["files"])
+        deflater = _BlockDeflater()
+        member = None
+        index_member = None
+        for index, block, block_deflated in \
+                _get_deflated_blocks(plan["files"], compressor):
+            source_file, destination_file, source_stat = plan["files"][index]
+            if isinstance(block, bytes):
+                deflater.block_deflated = block_deflated
+                member.write(block)
+                continue
+            # Stat of next file or error reading a file ends member written
+            if member is not None:
+                member.close()
+                member = None
+                # Member written in full unless error is of its file
+                if index != index_member:
+                    _count_file_copied(plan["files"][index_member][2],
+                                       files_total)
+            if isinstance(block, OSError):
+                BACKUP_COUNTERS["files_failed"] += 1
+                print(f"Could not archive {source_file}: {block}")
+                continue
+            if stat.S_IFMT(block.st_mode) not in (stat.S_IFREG, stat.S_IFLNK):
+                print(f"Not archiving {source_file}: zip archives can't "
+                      f"hold FIFOs, devices")
+                continue
+            arcname = os.path.relpath(destination_file, base_dir)
+            if stat.S_ISLNK(block.st_mode):
+                try:
+                    _write_zip_symlink(archive, source_file, arcname)
+                except OSError as error:
+                    BACKUP_COUNTERS["files_failed"] += 1
+                    print(f"Could not archive {source_file}: {error}")
+                    continue
+                _count_file_copied(block, files_total)
+                continue
+            member = _open_zip_member(archive, _get_zip_info(arcname, block),
+                                      deflater if compressor else None)
+            index_member = index
+        if member is not None:
+            member.close()
+            _count_file_copied(plan["files"][index_member][2], files_total)
+
+
+def _get_zip_info(arcname, source_stat):
+    # Return info of deflated zip member for file of source_stat, as
+    # ZipInfo.from_file gives without strict timestamps, from the stat of
+    # the file opened rather than its path
+    date_time = time.localtime(source_stat.st_mtime)[:6]
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        date_time = (2107, 12, 31, 23, 59, 59)
+    zip_info = zipfile.ZipInfo(arcname, date_time)
+    zip_info.external_attr = (source_stat.st_mode & 0xFFFF) << 16
+    zip_info.file_size = source_stat.st_size
+    zip_info.compress_type = zipfile.ZIP_DEFLATED
+    return zip_info
+
+
+def _open_zip_member(archive, zip_info, deflater):
+    # Return writer of archive member, writing blocks deflated by deflater
+    # instead of deflating them if given. Replaces the writer's compressor,
+    # an internal of zipfile: check with _can_write_deflated_blocks first
+    member = archive.open(zip_info, "w")
+    if deflater is not None:
+        member._compressor = deflater
+    return member
+
+
+def _can_write_deflated_blocks():
+    # Return whether zip members written by _open_zip_member from blocks
+    # deflated apart read back as written, checking once with an archive in
+    # memory, so zipfile changes fall back to deflating in zipfile rather
+    # than writing corrupt archives
+    global ZIP_DEFLATED_BLOCKS
+    if ZIP_DEFLATED_BLOCKS is not None:
+        return ZIP_DEFLATED_BLOCKS
+    blocks = [b"block deflated apart " * 64, b"and joined " * 64]
+    archive_file = io.BytesIO()
+    try:
+        with zipfile.ZipFile(archive_file, "w") as archive:
+            zip_info = zipfile.ZipInfo("check")
+            zip_info.compress_type = zipfile.ZIP_DEFLATED
+            deflater = _BlockDeflater()
+            with _open_zip_member(archive, zip_info, deflater) as member:
+                for block in blocks:
+                    deflater.block_deflated = _deflate_block(block)
+                    member.write(block)
+        with zipfile.ZipFile(archive_file) as archive:
+            ZIP_DEFLATED_BLOCKS = archive.testzip() is None and \
+                archive.read("check") == b"".join(blocks)
+    except Exception:
+        # Any error writing or reading means zipfile works differently
+        ZIP_DEFLATED_BLOCKS = False
+    return ZIP_DEFLATED_BLOCKS
+
+
+class _BlockDeflater:
+    """Stands in for compressor of zip member being written, returning each
+    block as already deflated"""
+
+    def __init__(self):
+        self.block_deflated = b""
+
+    def compress(self, data):
+        return self.block_deflated
+
+    def flush(self):
+        return DEFLATE_END
+
+
+def _get_deflated_blocks(files, compressor):
+    # Yield index of file, each item of it from _read_file_blocks and block
+    # deflated, deflating up to ARCHIVE_BLOCKS_PENDING blocks ahead, across
+    # files, in threads. No blocks deflated if no compressor
+    blocks_pending = deque()
+    for index, block in _read_file_blocks(files):
+        block_deflated = compressor.submit(_deflate_block, block) \
+            if compressor is not None and isinstance(block, bytes) else None
+        blocks_pending.append((index, block, block_deflated))
+        if len(blocks_pending) > ARCHIVE_BLOCKS_PENDING:
+            yield _get_deflated_block(*blocks_pending.popleft())
+    while blocks_pending:
+        yield _get_deflated_block(*blocks_pending.popleft())
+
+
+def _get_deflated_block(index, block, block_deflated):
+    if block_deflated is not None:
+        block_deflated = block_deflated.result()
+    return index, block, block_deflated
+
+
+def _read_file_blocks(files):
+    # Yield index of each file with its stat, taken once opened if regular
+    # file, then each block of its contents, or error if it cannot be read
+    for index, (source_file, _, source_stat) in enumerate(files):
+        if not stat.S_ISREG(source_stat.st_mode):
+            yield index, source_stat
+            continue
+        try:
+            with open(source_file, "rb") as file:
+                yield index, os.fstat(file.fileno())
+                while block := file.read(ARCHIVE_BLOCK_SIZE):
+                    yield index, block
+        except OSError as error:
+            yield index, error
+
+
+def _deflate_block(block):
+    # Return block as raw deflate, ending at a byte boundary with a full
+    # flush, so blocks deflated apart can be joined into one stream
+    deflater = zlib.compressobj(ARCHIVE_COMPRESS_LEVEL, zlib.DEFLATED,
+                                -zlib.MAX_WBITS)
+    return deflater.compress(block) + deflater.flush(zlib.Z_FULL_FLUSH)
+
+
+def _write_zip_symlink(archive, source_file, arcname):
+    # Write symlink as its target, marked as symlink in Unix mode bits
+    zip_info = zipfile.ZipInfo(arcname)
+    zip_info.external_attr = (stat.S_IFLNK | 0o777) << 16
+    archive.writestr(zip_info, os.readlink(source_file))
+
+
+"""Backup manifest."""
+
+
+def _get_manifest_path():
+    # Return manifest file of user-specified path, or in backup directory
+    if MANIFEST_PATH_ARG:
+        return _replace_rel_with_abs_path(MANIFEST_PATH_ARG)
+    return f"{BACKUP_DESTINATION}{MANIFEST_NAME}"
+
+
+def _load_manifest(manifest_path):
+    # Return manifest of files backed up, deleted in earlier runs
+    try:
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {"files": {}, "deleted": {}}
+
+
+def _save_manifest(manifest, manifest_path):
+    # Write manifest to temporary file first so it is never left partial
+    manifest_path_tmp = f"{manifest_path}.tmp"
+    with open(manifest_path_tmp, "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(manifest_path_tmp, manifest_path)
+
+
+def _record_file(source_file, destination_file, source_stat,
+                 content_hash=None):
+    # Record file backed up with the stat it was backed up at
+    record = {"destination": destination_file, "size": source_stat.st_size,
+              "mtime_ns": source_stat.st_mtime_ns,
+              "inode": source_stat.st_ino}
+    if content_hash is not None:
+        record["hash"] = content_hash
+    MANIFEST["files"][source_file] = record
+    MANIFEST["deleted"].pop(source_file, None)
+
+
+def _track_deleted_files(items):
+    # Move files in items recorded but not seen this run, and confirmed
+    # missing, to deleted files, deleting their copies if DELETE_COPIES.
+    # Files under items, directories that could not be read are kept
+    items_abs = [os.path.abspath(item) for item in items]
+    deleted_at = datetime.now().isoformat(timespec="seconds")
+    for source_file in list(MANIFEST["files"]):
+        if source_file in FILES_SEEN or \
+                not _is_path_under(source_file, items_abs) or \
+                _is_path_under(source_file, PATHS_FAILED) or \
+                not _is_path_missing(source_file):
+            continue
+        record = MANIFEST["files"].pop(source_file)
+        MANIFEST["deleted"][source_file] = {
+            "destination": record["destination"], "deleted": deleted_at}
+        print(f"{source_file} deleted since last backup")
+        # Copies in snapshots are kept with their snapshots
+        if DELETE_COPIES and not SNAPSHOT and \
+                os.path.lexists(record["destination"]):
+            os.unlink(record["destination"])
+
+
+def _is_path_under(path, paths):
+    # Return whether path is any of paths or in a directory of them
+    return any(path == path_parent or path.startswith(f"{path_parent}/")
+               for path_parent in paths)
+
+
+def _is_path_missing(path):
+    # Return whether path does not exist, not just unreadable
+    try:
+        os.lstat(path)
+    except OSError as error:
+        return error.errno in (errno.ENOENT, errno.ENOTDIR)
+    return False
+
+
+def _get_content_hash(path):
+    # Return hash of file contents, read in blocks
+    content_hash = hashlib.blake2b()
+    with open(path, "rb") as file:
+        while block := file.read(COPY_BLOCK_SIZE):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+"""Progress, stats."""
+
+
+def _count_file_copied(source_stat, files_total, linked=False):
+    # Count file copied, or linked unchanged into snapshot if linked, showing
+    # progress every PROGRESS_INTERVAL
+    global PROGRESS_TIME_NEXT
+    if linked:
+        BACKUP_COUNTERS["files_linked"] += 1
+    else:
+        BACKUP_COUNTERS["files_copied"] += 1
+        BACKUP_COUNTERS["bytes_copied"] += source_stat.st_size
+    if not PROGRESS:
+        return
+    files_done = BACKUP_COUNTERS["files_copied"] + \
+        BACKUP_COUNTERS["files_linked"]
+    time_now = time.perf_counter()
+    if time_now < PROGRESS_TIME_NEXT and files_done < files_total:
+        return
+    PROGRESS_TIME_NEXT = time_now + PROGRESS_INTERVAL
+    print(f"\rCopied {files_done}/{files_total} files, "
+          f"{_format_size(BACKUP_COUNTERS['bytes_copied'])}", end="",
+          file=sys.stderr, flush=True)
+    if files_done == files_total:
+        print(file=sys.stderr)
+
+
+def _print_backup_plan(plan):
+    # Print directories, files plan would copy and bytes to copy in total
+    for source_file, destination_file, source_stat in plan["files"]:
+        print(f"{source_file} -> {destination_file} "
+              f"({_format_size(source_stat.st_size)})")
+    bytes_planned = sum(source_stat.st_size
+                        for _, _, source_stat in plan["files"])
+    print(f"Would copy {len(plan['files'])} files, "
+          f"{_format_size(bytes_planned)}, into {len(plan['dirs'])} "
+          f"directories, skipping {plan['skipped']} unchanged files")
+
+
+def _get_stats(seconds_total):
+    # Return counters, phase timings, throughput of backup
+    seconds_copy = PHASE_SECONDS["copy"]
+    return {"seconds": seconds_total, "phases": dict(PHASE_SECONDS),
+            **BACKUP_COUNTERS, "dirs_listed": WALK_COUNTERS["listdir"],
+            "files_stat": WALK_COUNTERS["stat"],
+            "files_per_second": BACKUP_COUNTERS["files_copied"] /
+            seconds_copy if seconds_copy else 0.0,
+            "bytes_per_second": BACKUP_COUNTERS["bytes_copied"] /
+            seconds_copy if seconds_copy else 0.0}
 
 
-def _must_append_dir_name_to_path(substring_path, destination):
-    # Identify directories only in the root BACKUP_DESTINATION directory
-    return not (substring_path[-1] in destination and substring_path[-1]
-                is not "")
+def _print_stats(stats):
+    phases = stats["phases"]
+    print(f"Backup finished in {stats['seconds']:.2f} s")
+    print(f"  discovery  {phases['discovery']:8.2f} s  listed "
+          f"{stats['dirs_listed']} directories, stat-ed "
+          f"{stats['files_stat']} files")
+    print(f"  comparison {phases['comparison']:8.2f} s  skipped "
+          f"{stats['files_skipped']} unchanged files")
+    print(f"  copy       {phases['copy']:8.2f} s  copied "
+          f"{stats['files_copied']} files, "
+          f"{_format_size(stats['bytes_copied'])}, "
+          f"{stats['files_per_second']:.1f} files/s, "
+          f"{_format_size(stats['bytes_per_second'])}/s, "
+          f"{stats['files_linked']} linked unchanged, "
+          f"{stats['files_failed']} failed")
+    print(f"  fsync      {phases['fsync']:8.2f} s")
 
 
-def walk_dir(source, destination):
-    # Call to copy files, directories, in current directory
-    for parent_dir, sub_dirs, files in os.walk(source):
-        for child_file in files:
-            if parent_dir[len(source):].count(os.sep) < 1:
-                to_copy_files = [f"{parent_dir}/{child_file}"]
-                _copy_items(to_copy_files, f"{destination}/{child_file}")
-        for sub_dir in sub_dirs:
-            dest_dir = f"{destination}/{sub_dir}"
-            source_dir = [f"{parent_dir}/{sub_dir}"]
-            _copy_items(source_dir, dest_dir)
+def _format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
 
 
 """Helpers."""
@@ -132,10 +1058,38 @@ def backup():
     default if none provided.
     """
     global BACKUP_DESTINATION
+    global MANIFEST
+    time_start = time.perf_counter()
+    _get_flag_arguments()
     BACKUP_DESTINATION = _get_backup_dir(_select_backup_dir())
+    manifest_path = _get_manifest_path()
+    MANIFEST = _load_manifest(manifest_path)
     items_to_backup_list = _add_lines_to_list()
     to_backup = _update_paths(items_to_backup_list)
-    _copy_items(to_backup, BACKUP_DESTINATION)
+    if ARCHIVE_FORMAT:
+        # Archives are full backups, not recorded in manifest
+        _copy_items(to_backup, _get_archive_base_dir(BACKUP_DESTINATION))
+    elif SNAPSHOT and DRY_RUN:
+        # Snapshot not created, so every file is planned, though unchanged
+        # ones would only be linked
+        _copy_items(to_backup, _get_snapshot_dir(BACKUP_DESTINATION))
+    elif SNAPSHOT:
+        snapshot_dir = _start_snapshot(BACKUP_DESTINATION)
+        _copy_items(to_backup, snapshot_dir)
+        _save_snapshot_manifest(snapshot_dir)
+        print(f"Snapshot saved to {snapshot_dir}")
+    else:
+        _copy_items(to_backup, BACKUP_DESTINATION)
+    if not ARCHIVE_FORMAT and not DRY_RUN:
+        _track_deleted_files(to_backup)
+        _save_manifest(MANIFEST, manifest_path)
+    stats = _get_stats(time.perf_counter() - time_start)
+    if PRINT_STATS:
+        _print_stats(stats)
+    if FILE_STATS_JSON:
+        with open(FILE_STATS_JSON, "w") as stats_file:
+            json.dump(stats, stats_file, indent=4)
 
 
-backup()
+if __name__ == "__main__":
+    backup()
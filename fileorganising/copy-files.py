@@ -1,36 +1,85 @@
 #!/usr/bin/env python
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import ctypes
+import fnmatch
+import hashlib
+import json
 import os
+import re
+import select
 import shutil
+import struct
+import threading
+import time
 from pathlib import Path
 
-EXTENSION_TO_COPY = ""
+EXTENSIONS_TO_COPY = []
 RECURSIVE = False
 FORCE_COPY = False
 DIRECTORY_SOURCE = ""
 DIRECTORY_DESTINATION = os.path.expanduser("~/copy-files")
+VERIFY = False
+JOBS = 4
+GLOB_CHARACTERS = re.compile(r"[*?\[]")
+HASH_CACHE_NAME = ".copy-files-hashes.json"
+HASH_CACHE_LOCK = threading.Lock()
+COPY_BLOCK_SIZE = 1024 * 1024
+WATCH = False
+# Seconds without changes before copying changed files, most seconds to wait
+# for that, between walks of source if inotify unavailable
+WATCH_DEBOUNCE = 1.0
+WATCH_BATCH_MAX = 5.0
+WATCH_POLL_INTERVAL = 2.0
+# inotify event masks, from sys/inotify.h
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+INOTIFY_EVENT = struct.Struct("iIII")
+LIBC = None
 
 """Setup"""
 
 
 def _get_flag_arguments():
-    global EXTENSION_TO_COPY
+    global EXTENSIONS_TO_COPY
     global FORCE_COPY
     global RECURSIVE
+    global DIRECTORY_SOURCE
     global DIRECTORY_DESTINATION
+    global VERIFY
+    global JOBS
+    global WATCH
 
     parser = argparse.ArgumentParser()
     parser.add_argument("source")
-    parser.add_argument("destination", type=str,
+    parser.add_argument("destination", type=str, nargs="?",
                         help="(default: ~/copy-files)")
     parser.add_argument("-e", "--extension", type=str, required=True,
-                        help="file extension/type to copy (required)")
-    parser.add_argument("-f", "--force", type=bool, required=False,
+                        help="file extensions/types or name globs to copy, "
+                             "comma-separated, e.g. .jpg,.tar.gz,IMG_*.raw "
+                             "(required)")
+    parser.add_argument("-f", "--force", action="store_true",
                         help="copy all files, overwriting identical-size "
                              "files (default: False)")
-    parser.add_argument("-r", "--recursive", type=bool, required=False,
+    parser.add_argument("-v", "--verify", action="store_true",
+                        help="also compare modification times, then "
+                             "contents by hash if only those differ, keeping "
+                             f"hashes in {HASH_CACHE_NAME} in destination "
+                             "(default: False)")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help=f"number of files copied at once "
+                             f"(default: {JOBS})")
+    parser.add_argument("-r", "--recursive", action="store_true",
                         help="copy all files in specified directory tree "
                              "(default: False)")
+    parser.add_argument("-w", "--watch", action="store_true",
+                        help="after copying, keep copying files created or "
+                             "changed in source until interrupted "
+                             "(default: False)")
 
     args = parser.parse_args()
     if args.source:
@@ -38,62 +87,379 @@ def _get_flag_arguments():
     if args.destination:
         DIRECTORY_DESTINATION = args.destination
     if args.extension:
-        EXTENSION_TO_COPY = args.extension
+        EXTENSIONS_TO_COPY = [extension for extension
+                              in args.extension.split(",") if extension]
     if args.force:
         FORCE_COPY = args.force
     if args.recursive:
         RECURSIVE = args.recursive
+    if args.verify:
+        VERIFY = args.verify
+    if args.jobs:
+        JOBS = max(args.jobs, 1)
+    if args.watch:
+        WATCH = args.watch
 
 
 """Copy functionality"""
 
 
 def _handle_copy():
-    if RECURSIVE:
-        _copy_filetype_recursive(Path(DIRECTORY_SOURCE), Path(DIRECTORY_DESTINATION),
-                                 EXTENSION_TO_COPY)
-    else:
-        _copy_filetype(Path(DIRECTORY_SOURCE), Path(DIRECTORY_DESTINATION),
-                       EXTENSION_TO_COPY)
+    names_copied, source_snapshot, directories = _copy_filetypes(
+        Path(DIRECTORY_SOURCE), Path(DIRECTORY_DESTINATION),
+        EXTENSIONS_TO_COPY, RECURSIVE)
+    if WATCH:
+        _watch_filetypes(Path(DIRECTORY_DESTINATION), EXTENSIONS_TO_COPY,
+                         RECURSIVE, names_copied, source_snapshot,
+                         directories)
 
 
-def _copy_filetype(dir_source, dir_destination, filetype):
-    glob = f"*{filetype}"
+def _copy_filetypes(dir_source, dir_destination, filetypes, recursive):
+    # Copy files of any of filetypes found in one walk of dir_source into
+    # flat dir_destination in threads, skipping files whose names collide.
+    # Return source file of each name copied, size, modification time of
+    # each file copied, directories walked
     os.makedirs(dir_destination, exist_ok=True)
+    suffixes, globs_regex = _get_filetype_matchers(filetypes)
+    destination_index = _get_destination_index(dir_destination)
+    hash_cache = _load_hash_cache(dir_destination) if VERIFY else None
+    # Destination names copied to in this run, by source file
+    names_copied = {}
+    source_snapshot = {}
+    directories = []
 
-    for file in dir_source.glob(glob):
-        if Path(file).suffix == filetype:
-            if _is_dest_copied_file_different(Path(dir_source), dir_destination,
-                                              file):
-                shutil.copy(Path(dir_source) / Path(file),
-                            Path(dir_destination))
+    with ThreadPoolExecutor(max_workers=JOBS) as copier:
+        copies = []
+        for entry in _find_files(dir_source, recursive, directories):
+            if not _is_filetype(entry.name, suffixes, globs_regex):
+                continue
+            if entry.name in names_copied:
+                print(f"Not copying {entry.path}: name collides with "
+                      f"{names_copied[entry.name]} in {dir_destination}")
+                continue
+            names_copied[entry.name] = entry.path
+            stat_source = entry.stat()
+            source_snapshot[entry.path] = \
+                (stat_source.st_size, stat_source.st_mtime_ns)
+            copies.append((entry.path, copier.submit(
+                _copy_file_if_different, entry.path, stat_source,
+                destination_index.get(entry.name), dir_destination,
+                hash_cache)))
+        _report_copy_errors(copies)
+    if hash_cache is not None:
+        _save_hash_cache(dir_destination, hash_cache)
+    return names_copied, source_snapshot, directories
 
 
-def _copy_filetype_recursive(dir_source, dir_destination, filetype):
-    os.makedirs(dir_destination, exist_ok=True)
+def _report_copy_errors(copies):
+    # Wait for copies, reporting errors in order files were found. Return
+    # number of files copied
+    files_copied = 0
+    for path, copy in copies:
+        try:
+            if copy.result():
+                files_copied += 1
+        except OSError as error:
+            print(f"Could not copy {path}: {error}")
+    return files_copied
+
 
-    for directory, sub_directories, files in os.walk(dir_source):
-        for file in files:
-            if Path(file).suffix == filetype:
-                if _is_dest_copied_file_different(Path(directory),
-                                                  dir_destination, file):
-                    shutil.copy((Path(directory) / Path(file)),
-                                Path(dir_destination))
+def _copy_file_if_different(path_source, stat_source, stat_destination,
+                            dir_destination, hash_cache):
+    # Copy file if forced, different from its copy or no stat_destination
+    # given, hashing it while copying if verifying. Return whether copied
+    path_destination = os.path.join(dir_destination,
+                                    os.path.basename(path_source))
+    if not FORCE_COPY and not _is_dest_copied_file_different(
+            path_source, stat_source, path_destination, stat_destination,
+            hash_cache):
+        return False
+    if hash_cache is None:
+        shutil.copy(path_source, dir_destination)
+    else:
+        _copy_file_hashed(path_source, stat_source, path_destination,
+                          hash_cache)
+    return True
 
 
-"""Helpers"""
+def _copy_file_hashed(path_source, stat_source, path_destination,
+                      hash_cache):
+    # Copy file with its modification time, hashing contents as they are
+    # copied, so neither file is read again to verify them later
+    file_hash = hashlib.blake2b()
+    with open(path_source, "rb") as source, \
+            open(path_destination, "wb") as destination:
+        while block := source.read(COPY_BLOCK_SIZE):
+            file_hash.update(block)
+            destination.write(block)
+    shutil.copystat(path_source, path_destination)
+    file_hash = file_hash.hexdigest()
+    with HASH_CACHE_LOCK:
+        for path in (path_source, path_destination):
+            hash_cache[os.path.abspath(path)] = \
+                [stat_source.st_size, stat_source.st_mtime_ns, file_hash]
+
+
+def _find_files(dir_source, recursive, directories_found=None):
+    # Yield entries of files in dir_source, and its subdirectories if
+    # recursive, listing each directory once, adding directories listed to
+    # directories_found
+    directories = [str(dir_source)]
+    while directories:
+        directory = directories.pop()
+        if directories_found is not None:
+            directories_found.append(directory)
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        yield entry
+                    elif recursive and entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+        except OSError as error:
+            print(f"Could not read {directory}: {error}")
+
+
+def _get_destination_index(dir_destination):
+    # Return sizes, modification times of files in dir_destination by name,
+    # read in one listing
+    destination_index = {}
+    with os.scandir(dir_destination) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat_destination = entry.stat()
+                destination_index[entry.name] = \
+                    (stat_destination.st_size, stat_destination.st_mtime_ns)
+    return destination_index
+
+
+def _load_hash_cache(dir_destination):
+    # Return hashes of files by path, with size, modification time hashed at
+    try:
+        with open(Path(dir_destination) / HASH_CACHE_NAME) as cache_file:
+            return json.load(cache_file)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_hash_cache(dir_destination, hash_cache):
+    path_cache = Path(dir_destination) / HASH_CACHE_NAME
+    with open(f"{path_cache}.tmp", "w") as cache_file:
+        json.dump(hash_cache, cache_file)
+    os.replace(f"{path_cache}.tmp", path_cache)
+
+
+def _get_file_hash(path, size, mtime_ns, hash_cache):
+    # Return hash of file contents, from cache if file unchanged since hashed
+    path = os.path.abspath(path)
+    with HASH_CACHE_LOCK:
+        cached = hash_cache.get(path)
+    if cached is not None and cached[0] == size and cached[1] == mtime_ns:
+        return cached[2]
+    file_hash = hashlib.blake2b()
+    with open(path, "rb") as file:
+        while block := file.read(COPY_BLOCK_SIZE):
+            file_hash.update(block)
+    file_hash = file_hash.hexdigest()
+    with HASH_CACHE_LOCK:
+        hash_cache[path] = [size, mtime_ns, file_hash]
+    return file_hash
+
+
+"""Watch functionality"""
 
 
-def _is_dest_copied_file_different(dir_source, dir_destination, file):
-    if (Path(dir_destination) / Path(file)).is_file():
-        return os.path.getsize(Path(dir_destination) / Path(file)) != \
-               os.path.getsize(Path(dir_source) / Path(file))
+def _watch_filetypes(dir_destination, filetypes, recursive, names_copied,
+                     source_snapshot, directories):
+    # Copy files of filetypes created or changed in directories, in batches
+    # once changes pause, until interrupted
+    suffixes, globs_regex = _get_filetype_matchers(filetypes)
+    hash_cache = _load_hash_cache(dir_destination) if VERIFY else None
+    inotify_fd, watches = _start_inotify(directories)
+    print(f"Watching {len(directories)} directories "
+          f"{'with inotify' if inotify_fd is not None else 'by polling'}, "
+          f"interrupt to stop")
+    try:
+        with ThreadPoolExecutor(max_workers=JOBS) as copier:
+            while True:
+                if inotify_fd is not None:
+                    paths_changed = _wait_for_inotify_changes(
+                        inotify_fd, watches, recursive)
+                else:
+                    time.sleep(WATCH_POLL_INTERVAL)
+                    paths_changed = [entry.path for entry in _find_files(
+                        directories[0], recursive)]
+                _copy_changed_files(
+                    paths_changed, dir_destination, suffixes, globs_regex,
+                    names_copied, source_snapshot, hash_cache, copier)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        if inotify_fd is not None:
+            os.close(inotify_fd)
+        if hash_cache is not None:
+            _save_hash_cache(dir_destination, hash_cache)
+
+
+def _copy_changed_files(paths_changed, dir_destination, suffixes,
+                        globs_regex, names_copied, source_snapshot,
+                        hash_cache, copier):
+    # Copy files of filetypes changed since in source_snapshot. Copied
+    # without comparing to their copies, as a changed size or modification
+    # time shows they changed, where an edit may keep the size
+    copies = []
+    for path in sorted(set(paths_changed)):
+        name = os.path.basename(path)
+        if not _is_filetype(name, suffixes, globs_regex):
+            continue
+        try:
+            stat_source = os.stat(path)
+        except FileNotFoundError:
+            source_snapshot.pop(path, None)
+            continue
+        except OSError as error:
+            print(f"Could not copy {path}: {error}")
+            continue
+        if source_snapshot.get(path) == \
+                (stat_source.st_size, stat_source.st_mtime_ns):
+            continue
+        if names_copied.setdefault(name, path) != path:
+            print(f"Not copying {path}: name collides with "
+                  f"{names_copied[name]} in {dir_destination}")
+            continue
+        source_snapshot[path] = (stat_source.st_size, stat_source.st_mtime_ns)
+        copies.append((path, copier.submit(
+            _copy_file_if_different, path, stat_source, None,
+            dir_destination, hash_cache)))
+    files_copied = _report_copy_errors(copies)
+    if files_copied:
+        print(f"Copied {files_copied} changed files")
+
+
+def _wait_for_inotify_changes(inotify_fd, watches, recursive):
+    # Return paths with inotify events, collected from first event until
+    # none for WATCH_DEBOUNCE, or for at most WATCH_BATCH_MAX
+    paths_changed = []
+    select.select([inotify_fd], [], [])
+    time_batch_end = time.monotonic() + WATCH_BATCH_MAX
+    while True:
+        _read_inotify_events(inotify_fd, watches, recursive, paths_changed)
+        timeout = min(WATCH_DEBOUNCE, time_batch_end - time.monotonic())
+        if timeout <= 0 or \
+                not select.select([inotify_fd], [], [], timeout)[0]:
+            return paths_changed
+
+
+def _start_inotify(directories):
+    # Return inotify file descriptor watching directories, with directory of
+    # each watch descriptor. None if inotify unavailable
+    global LIBC
+    try:
+        LIBC = ctypes.CDLL(None, use_errno=True)
+        inotify_fd = LIBC.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, {}
+    if inotify_fd < 0:
+        return None, {}
+    watches = {}
+    for directory in directories:
+        if not _add_inotify_watch(inotify_fd, watches, directory):
+            os.close(inotify_fd)
+            return None, {}
+    return inotify_fd, watches
+
+
+def _add_inotify_watch(inotify_fd, watches, directory):
+    # Watch directory, returning whether watched
+    watch = LIBC.inotify_add_watch(inotify_fd, os.fsencode(directory),
+                                   INOTIFY_MASK)
+    if watch < 0:
+        return False
+    watches[watch] = directory
     return True
 
 
+def _read_inotify_events(inotify_fd, watches, recursive, paths_changed):
+    # Add paths of files with inotify events to paths_changed, watching, and
+    # adding files of, directories created if recursive
+    try:
+        events = os.read(inotify_fd, 64 * 1024)
+    except BlockingIOError:
+        return
+    offset = 0
+    while offset < len(events):
+        watch, mask, _, length = INOTIFY_EVENT.unpack_from(events, offset)
+        offset += INOTIFY_EVENT.size
+        name = os.fsdecode(events[offset:offset + length].rstrip(b"\0"))
+        offset += length
+        if mask & IN_Q_OVERFLOW:
+            # Events lost: check all files of watched directories
+            for directory in list(watches.values()):
+                paths_changed.extend(entry.path for entry
+                                     in _find_files(directory, False))
+            continue
+        path = os.path.join(watches.get(watch, ""), name)
+        if not mask & IN_ISDIR:
+            paths_changed.append(path)
+        elif recursive:
+            # Files may be created in directory before it is watched
+            directories_created = []
+            paths_changed.extend(entry.path for entry in _find_files(
+                path, True, directories_created))
+            for directory in directories_created:
+                _add_inotify_watch(inotify_fd, watches, directory)
+
+
+"""Helpers"""
+
+
+def _get_filetype_matchers(filetypes):
+    # Return set of suffixes to look up, regex of globs to match names with
+    suffixes = set()
+    globs = []
+    for filetype in filetypes:
+        if GLOB_CHARACTERS.search(filetype):
+            globs.append(fnmatch.translate(filetype))
+        else:
+            suffixes.add(filetype if filetype.startswith(".")
+                         else f".{filetype}")
+    globs_regex = re.compile("|".join(globs)) if globs else None
+    return suffixes, globs_regex
+
+
+def _is_filetype(name, suffixes, globs_regex):
+    # Check each of name's suffixes, e.g. .gz and .tar.gz, in suffixes, then
+    # globs. Leading dot of hidden files is not a suffix
+    dot = name.find(".", 1)
+    while dot != -1:
+        if name[dot:] in suffixes:
+            return True
+        dot = name.find(".", dot + 1)
+    return globs_regex is not None and globs_regex.match(name) is not None
+
+
+def _is_dest_copied_file_different(path_source, stat_source,
+                                   path_destination, stat_destination,
+                                   hash_cache):
+    # Compare sizes, then if verifying, modification times, then hashes of
+    # contents only if those differ
+    if stat_destination is None:
+        return True
+    size_destination, mtime_destination = stat_destination
+    if size_destination != stat_source.st_size:
+        return True
+    if hash_cache is None or mtime_destination == stat_source.st_mtime_ns:
+        return False
+    return _get_file_hash(path_source, stat_source.st_size,
+                          stat_source.st_mtime_ns, hash_cache) != \
+        _get_file_hash(path_destination, size_destination, mtime_destination,
+                       hash_cache)
+
+
 def main():
     _get_flag_arguments()
     _handle_copy()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,38 @@
     - Delete file: os.unlink({path})
     - Delete empty directory: os.rmdir({path})
     - Delete directory: shutil.rmtree({path})
+    - Zip file, directory tree: _zip_archive(path, path_zip), or add to
+      existing archive: _zip_archive_add(path, path_zip)
+    - Unzip members matching glob: _zip_extract(path_zip, "*.txt")
 
 """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import fnmatch
 import os
 from pathlib import Path
 import shutil
+import struct
+import tempfile
 import zipfile
+import zlib
+
+# Zip: members compressed at once in processes, one per core, and ahead of
+# writing, size of chunks read, written
+ZIP_JOBS = os.cpu_count() or 1
+ZIP_MEMBERS_PENDING = 2 * ZIP_JOBS
+ZIP_CHUNK_SIZE = 1024 * 1024
+ZIP_COMPRESS_LEVEL = 6
+# Whether members can be written from spool files through zipfile
+# internals, None until checked
+ZIP_SPOOLED_MEMBERS = None
+# Members of archives read, by archive path, with archive's size,
+# modification time when read
+ZIP_INDEXES = {}
+# Uncompressed bytes of members extracted above which processes extract
+# them in parallel
+ZIP_EXTRACT_PARALLEL_SIZE = 8 * 1024 * 1024
 
 
 def _walk_example(path):
@@ -100,38 +125,252 @@ def _zip_examples():
     _zip_extract(path_current_directory / name_archive)
 
 
-def _zip_archive(path_file_to_zip, path_zip):
-    zip_to_make = zipfile.ZipFile(path_zip, "w")
-
-    zip_to_make.write(path_file_to_zip, compress_type=zipfile.ZIP_DEFLATED)
-    zip_to_make.close()
+def _zip_archive(path_file_to_zip, path_zip, mode="w"):
+    # Zip file, or directory tree, compressing files in parallel processes
+    # to spool files, then copying them into archive as members, or by
+    # zipfile if it can't be written to that way. Mode "a" appends members,
+    # only rewriting the central directory after them
+    paths_to_zip = _get_paths_to_zip(path_file_to_zip)
+    spooled = _can_write_zip_members_spooled()
+    with zipfile.ZipFile(path_zip, mode, zipfile.ZIP_DEFLATED,
+                         strict_timestamps=False) as zip_to_make, \
+            tempfile.TemporaryDirectory(dir=Path(path_zip).parent) \
+            as dir_spool, \
+            ProcessPoolExecutor(max_workers=ZIP_JOBS) as compressor:
+        members_pending = deque()
+        for path, is_dir in paths_to_zip:
+            member_deflated = None if is_dir or not spooled else \
+                compressor.submit(_deflate_to_spool, path, dir_spool)
+            members_pending.append((path, member_deflated))
+            if len(members_pending) > ZIP_MEMBERS_PENDING:
+                _write_zip_member_deflated(zip_to_make,
+                                           *members_pending.popleft())
+        while members_pending:
+            _write_zip_member_deflated(zip_to_make,
+                                       *members_pending.popleft())
 
 
 def _zip_archive_add(path_file_to_zip, path_zip):
-    zip_to_update = zipfile.ZipFile(path_zip, "w")
-
-    zip_to_update.write(path_file_to_zip, compress_type=zipfile.ZIP_DEFLATED)
-    zip_to_update.close()
+    _zip_archive(path_file_to_zip, path_zip, "a")
+
+
+def _get_paths_to_zip(path_file_to_zip):
+    # Return paths of file, or of directory tree's directories, files, with
+    # whether each is a directory
+    if not os.path.isdir(path_file_to_zip):
+        return [(path_file_to_zip, False)]
+    paths_to_zip = []
+    directories = [path_file_to_zip]
+    while directories:
+        directory = directories.pop()
+        paths_to_zip.append((directory, True))
+        sub_directories = []
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_dir(follow_symlinks=False):
+                    sub_directories.append(entry.path)
+                elif entry.is_file():
+                    paths_to_zip.append((entry.path, False))
+        # Zip sub-directories next, in name order
+        directories.extend(reversed(sub_directories))
+    return paths_to_zip
+
+
+def _deflate_to_spool(path, dir_spool):
+    # Compress file in chunks to raw deflate spool file in dir_spool. Return
+    # file's CRC, size, spool file's path, size
+    compressor = zlib.compressobj(ZIP_COMPRESS_LEVEL, zlib.DEFLATED,
+                                  -zlib.MAX_WBITS)
+    crc = 0
+    file_size = 0
+    fd_spool, path_spool = tempfile.mkstemp(dir=dir_spool)
+    with open(path, "rb") as file, open(fd_spool, "wb") as spool:
+        while chunk := file.read(ZIP_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            spool.write(compressor.compress(chunk))
+        spool.write(compressor.flush())
+        compress_size = spool.tell()
+    return crc, file_size, path_spool, compress_size
+
+
+def _write_zip_member_deflated(zip_to_make, path, member_deflated):
+    # Write file's member from its spool file, or directories' and files
+    # not spooled directly
+    if member_deflated is None:
+        zip_to_make.write(path)
+        return
+    file_info = zipfile.ZipInfo.from_file(path, strict_timestamps=False)
+    _write_zip_member_spooled(zip_to_make, file_info,
+                              *member_deflated.result())
+
+
+def _write_zip_member_spooled(zip_to_make, file_info, crc, file_size,
+                              path_spool, compress_size):
+    # Write member from raw deflate spool file, as ZipFile.open() would but
+    # with CRC, sizes known before header, so it is written once. Writes
+    # through zipfile internals: check with _can_write_zip_members_spooled
+    # first
+    file_info.compress_type = zipfile.ZIP_DEFLATED
+    file_info.CRC = crc
+    file_info.file_size = file_size
+    file_info.compress_size = compress_size
+    with zip_to_make._lock:
+        if zip_to_make._seekable:
+            zip_to_make.fp.seek(zip_to_make.start_dir)
+        file_info.header_offset = zip_to_make.fp.tell()
+        zip_to_make._writecheck(file_info)
+        zip_to_make._didModify = True
+        zip_to_make.fp.write(file_info.FileHeader())
+        with open(path_spool, "rb") as spool:
+            shutil.copyfileobj(spool, zip_to_make.fp, ZIP_CHUNK_SIZE)
+        zip_to_make.start_dir = zip_to_make.fp.tell()
+        zip_to_make.filelist.append(file_info)
+        zip_to_make.NameToInfo[file_info.filename] = file_info
+    os.unlink(path_spool)
+
+
+def _can_write_zip_members_spooled():
+    # Return whether members written by _write_zip_member_spooled, to new
+    # and appended archives, read back as written, checking once with a
+    # small archive, so zipfile changes fall back to zipfile's own writing
+    # rather than corrupt archives
+    global ZIP_SPOOLED_MEMBERS
+    if ZIP_SPOOLED_MEMBERS is not None:
+        return ZIP_SPOOLED_MEMBERS
+    data = b"member written from spool file " * 64
+    try:
+        with tempfile.TemporaryDirectory() as dir_check:
+            path_data = Path(dir_check) / "data"
+            path_data.write_bytes(data)
+            path_zip = Path(dir_check) / "check.zip"
+            for mode in ("w", "a"):
+                with zipfile.ZipFile(path_zip, mode) as zip_to_check:
+                    _write_zip_member_spooled(
+                        zip_to_check, zipfile.ZipInfo(mode),
+                        *_deflate_to_spool(path_data, dir_check))
+            with zipfile.ZipFile(path_zip) as zip_to_check:
+                ZIP_SPOOLED_MEMBERS = zip_to_check.testzip() is None and \
+                    zip_to_check.namelist() == ["w", "a"] and \
+                    all(zip_to_check.read(name) == data
+                        for name in ("w", "a"))
+    except Exception:
+        # Any error writing or reading means zipfile works differently
+        ZIP_SPOOLED_MEMBERS = False
+    return ZIP_SPOOLED_MEMBERS
 
 
 def _zip_read(path_zip, name_file):
-    zip_to_read = zipfile.ZipFile(path_zip, "r")
-    print(f"zip file contains: {zip_to_read.namelist()}")
+    zip_index = _zip_index(path_zip)
+    print(f"zip file contains: {list(zip_index)}")
 
-    file_info = zip_to_read.getinfo(name_file)
+    file_info = zip_index[name_file]
     compression_ration = round(file_info.file_size / file_info.compress_size, 2)
     print(f"{file_info.filename} compression ratio is {compression_ration}\n"
           f"Original size: {file_info.file_size}, compressed size: "
           f"{file_info.compress_size}")
-    zip_to_read.close()
-    pass
-
 
-def _zip_extract(path):
-    zip_to_extract = zipfile.ZipFile(path, "r")
 
-    zip_to_extract.extractall(zip_to_extract.filename + "_unzipped")
-    zip_to_extract.close()
+def _zip_index(path_zip):
+    # Return archive's members by name, reading its central directory only
+    # if not read since archive last changed
+    stat_zip = os.stat(path_zip)
+    path_zip = os.path.abspath(path_zip)
+    version = (stat_zip.st_size, stat_zip.st_mtime_ns)
+    if path_zip in ZIP_INDEXES and ZIP_INDEXES[path_zip][0] == version:
+        return ZIP_INDEXES[path_zip][1]
+    with zipfile.ZipFile(path_zip, "r") as zip_to_index:
+        zip_index = {file_info.filename: file_info
+                     for file_info in zip_to_index.infolist()}
+    ZIP_INDEXES[path_zip] = (version, zip_index)
+    return zip_index
+
+
+def _zip_extract(path, pattern="*", dir_destination=None):
+    # Extract members with names matching glob pattern, streaming each to
+    # disk, in parallel processes if large
+    if dir_destination is None:
+        dir_destination = f"{path}_unzipped"
+    members_to_extract = []
+    for name, file_info in _zip_index(path).items():
+        path_member = _get_member_destination(dir_destination, name)
+        if path_member is None or not fnmatch.fnmatchcase(name, pattern):
+            continue
+        if file_info.is_dir():
+            os.makedirs(path_member, exist_ok=True)
+            continue
+        os.makedirs(path_member.parent, exist_ok=True)
+        members_to_extract.append((file_info, path_member))
+
+    if len(members_to_extract) < 2 or ZIP_EXTRACT_PARALLEL_SIZE > sum(
+            file_info.file_size for file_info, _ in members_to_extract):
+        for file_info, path_member in members_to_extract:
+            _extract_member(path, file_info, path_member)
+        return
+    with ProcessPoolExecutor(max_workers=ZIP_JOBS) as decompressor:
+        extracts = [decompressor.submit(_extract_member, path, file_info,
+                                        path_member)
+                    for file_info, path_member in members_to_extract]
+        for extract in extracts:
+            extract.result()
+
+
+def _get_member_destination(dir_destination, name):
+    # Return path to extract member to, dropping parts of name leaving
+    # dir_destination as ZipFile.extract() does. None if no parts left
+    parts = [part for part in name.split("/")
+             if part not in ("", ".", "..")]
+    return Path(dir_destination, *parts) if parts else None
+
+
+def _extract_member(path_zip, file_info, path_member):
+    # Stream member's data from after its local header to path_member in
+    # chunks, checking its CRC. Members not stored or deflated, or
+    # encrypted, are extracted by zipfile
+    if file_info.compress_type not in (zipfile.ZIP_STORED,
+                                       zipfile.ZIP_DEFLATED) or \
+            file_info.flag_bits & 0x1:
+        with zipfile.ZipFile(path_zip, "r") as zip_to_extract, \
+                zip_to_extract.open(file_info) as member, \
+                open(path_member, "wb") as member_file:
+            shutil.copyfileobj(member, member_file, ZIP_CHUNK_SIZE)
+        return
+    with open(path_zip, "rb") as zip_file, \
+            open(path_member, "wb") as member_file:
+        zip_file.seek(file_info.header_offset)
+        header = struct.unpack(zipfile.structFileHeader,
+                               zip_file.read(zipfile.sizeFileHeader))
+        if header[0] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(
+                f"Bad local header for member {file_info.filename}")
+        zip_file.seek(header[zipfile._FH_FILENAME_LENGTH] +
+                      header[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS) \
+            if file_info.compress_type == zipfile.ZIP_DEFLATED else None
+        crc = 0
+        remaining = file_info.compress_size
+        while remaining:
+            chunk = zip_file.read(min(ZIP_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(
+                    f"Truncated member {file_info.filename}")
+            remaining -= len(chunk)
+            if decompressor is None:
+                crc = zlib.crc32(chunk, crc)
+                member_file.write(chunk)
+                continue
+            # Decompress at most a chunk at a time to keep memory bounded
+            while chunk:
+                data = decompressor.decompress(chunk, ZIP_CHUNK_SIZE)
+                crc = zlib.crc32(data, crc)
+                member_file.write(data)
+                chunk = decompressor.unconsumed_tail
+        if decompressor is not None:
+            data = decompressor.flush()
+            crc = zlib.crc32(data, crc)
+            member_file.write(data)
+    if crc != file_info.CRC:
+        raise zipfile.BadZipFile(f"Bad CRC-32 for file {file_info.filename}")
 
 
 def main():
@@ -141,4 +380,5 @@ def main():
     _copy_filetype_example()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+"""Measure log_reader.py throughput on generated syslog-style log files,
+writing results as JSON for comparing runs.
+
+Runs the whole log_reader.py pipeline as a separate process, then each stage
+(discovery, matching, copy, report writing) on its own, reporting lines/sec,
+MB/sec and peak RSS of each.
+
+Examples:
+    `python3 benchmark.py` generates 4 files of 16 MiB with 2% of lines
+    containing issues, writing results to ./benchmark.json
+
+    `python3 benchmark.py -s 256 -n 8 -i 0.1 -l 200 -j 8 -o run.json`
+    generates 8 files of 256 MiB with 10% of lines containing issues, lines
+    of about 200 characters, running log_reader.py with 8 processes
+
+    `python3 benchmark.py -d ./corpus` keeps generated files in ./corpus,
+    reusing them in later runs with the same settings
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import log_reader
+
+# Global variables: based on flags
+SIZE_MB = 16
+NUMBER_FILES = 4
+ISSUE_DENSITY = 0.02
+LINE_LENGTH = 120
+JOBS = 1
+DIR_CORPUS = ""
+FILE_RESULTS = Path("./benchmark.json")
+
+# Global variables: general
+PATH_LOG_READER = Path(__file__).resolve().parent / "log_reader.py"
+SEED = 0
+HOSTS = ["web01", "web02", "db01", "cache01"]
+PROCESSES = ["sshd", "kernel", "systemd", "CRON", "dockerd", "nginx"]
+MESSAGES = ["Accepted publickey for deploy from 10.0.{}.{} port {}",
+            "Started Session {} of user admin.",
+            "eth0: link up, {} Mbps full duplex",
+            "(root) CMD (run-parts /etc/cron.hourly) pid {}",
+            "connection from 192.168.{}.{} closed after {} ms"]
+MESSAGES_ISSUES = ["Error: disk /dev/sda{} failed, retrying in {} s",
+                   "warning: memory usage at {}% on node {}",
+                   "Failed password for invalid user from 10.1.{}.{}",
+                   "task {} failed: timeout after {} ms"]
+
+"""Setup"""
+
+
+def _get_flag_arguments():
+    global SIZE_MB
+    global NUMBER_FILES
+    global ISSUE_DENSITY
+    global LINE_LENGTH
+    global JOBS
+    global DIR_CORPUS
+    global FILE_RESULTS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--size", type=int,
+                        help="MiB of each generated log file (default: 16)")
+    parser.add_argument("-n", "--number-files", type=int,
+                        help="number of log files to generate (default: 4)")
+    parser.add_argument("-i", "--issue-density", type=float,
+                        help="fraction of lines containing issues "
+                             "(default: 0.02)")
+    parser.add_argument("-l", "--line-length", type=int,
+                        help="approximate characters per line (default: 120)")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="processes log_reader.py checks files with "
+                             "(default: 1)")
+    parser.add_argument("-d", "--directory", type=str,
+                        help="directory to keep generated log files in "
+                             "(default: temporary directory)")
+    parser.add_argument("-o", "--output", type=str,
+                        help="file to write JSON results to "
+                             "(default: ./benchmark.json)")
+    args = parser.parse_args()
+    if args.size:
+        SIZE_MB = args.size
+    if args.number_files:
+        NUMBER_FILES = args.number_files
+    if args.issue_density is not None:
+        ISSUE_DENSITY = args.issue_density
+    if args.line_length:
+        LINE_LENGTH = args.line_length
+    if args.jobs:
+        JOBS = args.jobs
+    if args.directory:
+        DIR_CORPUS = args.directory
+    if args.output:
+        FILE_RESULTS = Path(args.output)
+
+
+"""Log generation"""
+
+
+def generate_log_corpus(dir_corpus):
+    # Write log files to dir_corpus unless already generated with same
+    # settings, return their paths and number of lines
+    file_settings = Path(dir_corpus) / "corpus.json"
+    settings = {"size_mb": SIZE_MB, "number_files": NUMBER_FILES,
+                "issue_density": ISSUE_DENSITY, "line_length": LINE_LENGTH,
+                "seed": SEED}
+    paths_logs = [Path(dir_corpus) / f"bench{i}.log"
+                  for i in range(NUMBER_FILES)]
+    if file_settings.is_file():
+        with open(file_settings) as file:
+            corpus = json.load(file)
+        if corpus["settings"] == settings:
+            return paths_logs, corpus["lines"]
+    lines = 0
+    for i, path_log in enumerate(paths_logs):
+        lines += _write_log_file(path_log, random.Random(SEED + i))
+    with open(file_settings, "w") as file:
+        json.dump({"settings": settings, "lines": lines}, file)
+    return paths_logs, lines
+
+
+def _write_log_file(path_log, rng):
+    # Write SIZE_MB of syslog-style lines to path_log, return number of lines
+    size = SIZE_MB * 1024 * 1024
+    written = 0
+    lines = 0
+    with open(path_log, "w") as file:
+        while written < size:
+            line = _get_log_line(rng)
+            file.write(line)
+            written += len(line)
+            lines += 1
+    return lines
+
+
+def _get_log_line(rng):
+    # Return random syslog-style line, padded to about LINE_LENGTH
+    messages = MESSAGES_ISSUES if rng.random() < ISSUE_DENSITY else MESSAGES
+    message = rng.choice(messages).format(
+        *(rng.randrange(1000) for _ in range(3)))
+    line = f"Oct {rng.randrange(1, 32):2} {rng.randrange(24):02}:" \
+           f"{rng.randrange(60):02}:{rng.randrange(60):02} " \
+           f"{rng.choice(HOSTS)} {rng.choice(PROCESSES)}" \
+           f"[{rng.randrange(1, 32768)}]: {message}"
+    padding = LINE_LENGTH - len(line)
+    if padding > 0:
+        line = f"{line} (" + "x" * max(padding - 3, 0) + ")"
+    return f"{line}\n"
+
+
+"""Stages"""
+
+
+def _stage_discovery(dir_corpus):
+    # Find log files in dir_corpus as log_reader.py -d -R does
+    return sum(1 for _ in log_reader.find_log_files(dir_corpus, None))
+
+
+def _stage_matching(paths_logs):
+    # Find issues in log files, return number of issues found
+    engine = log_reader._get_match_engine(log_reader.ISSUES_REGEX, None,
+                                          False, None)
+    issues = 0
+    for path_log in paths_logs:
+        _, issues_found_keyword, _ = log_reader._get_log_issues(
+            path_log, engine, 0, os.path.getsize(path_log))
+        issues += sum(issues_found_keyword.values())
+    return issues
+
+
+def _stage_copy(paths_logs, dir_dest):
+    # Copy log files to dir_dest as log_reader.py does
+    for path_log in paths_logs:
+        log_reader._copy_file_contents(path_log,
+                                       Path(dir_dest) / path_log.name)
+    return len(paths_logs)
+
+
+def _stage_report(paths_logs, dir_dest):
+    # Find issues in log files, then time writing only their reports
+    engine = log_reader._get_match_engine(log_reader.ISSUES_REGEX, None,
+                                          False, None)
+    issues = [log_reader._get_log_issues(path_log, engine, 0,
+                                         os.path.getsize(path_log))
+              for path_log in paths_logs]
+    start = time.perf_counter()
+    for path_log, (issues_found, issues_found_keyword, _) in \
+            zip(paths_logs, issues):
+        path_report = Path(dir_dest) / path_log.name
+        log_reader.write_log_file_issues(
+            log_reader._get_logs_issues_filename(path_report),
+            log_reader._sort_issues(issues_found))
+        log_reader.write_log_file_issues_short(
+            log_reader._get_logs_issues_keywords_filename(path_report),
+            log_reader._sort_issues(issues_found_keyword))
+    return time.perf_counter() - start
+
+
+"""Measurement"""
+
+
+def _measure_pipeline(paths_logs, dir_work):
+    # Run log_reader.py on log files in its own process, return wall seconds
+    # and peak RSS in KiB
+    command = [sys.executable, str(PATH_LOG_READER),
+               "-d", str(paths_logs[0].parent),
+               "-f", ",".join(path_log.name for path_log in paths_logs),
+               "-j", str(JOBS)]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=dir_work,
+                               stdout=subprocess.DEVNULL)
+    _, status, rusage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        print(f"log_reader.py exited with {process.returncode}")
+    return seconds, rusage.ru_maxrss
+
+
+def _measure_stage(stage, *args):
+    # Run stage in forked process, return its result, wall seconds and peak
+    # RSS in KiB. Raises RuntimeError with stage's error if it fails
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Never return from child, which would clean up parent's directories
+        try:
+            os.close(read_fd)
+            with os.fdopen(write_fd, "w") as pipe:
+                try:
+                    start = time.perf_counter()
+                    result = stage(*args)
+                    json.dump({"result": result,
+                               "seconds": time.perf_counter() - start}, pipe)
+                except Exception as error:
+                    json.dump({"error": f"{type(error).__name__}: {error}"},
+                              pipe)
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        output = pipe.read()
+    _, _, rusage = os.wait4(pid, 0)
+    try:
+        measured = json.loads(output)
+    except ValueError:
+        measured = {"error": "stage process exited without result"}
+    if "error" in measured:
+        raise RuntimeError(f"Stage {stage.__name__} failed: "
+                           f"{measured['error']}")
+    return measured["result"], measured["seconds"], rusage.ru_maxrss
+
+
+def _get_result(name, seconds, size, lines, peak_rss, unit="lines"):
+    # Return result of stage with throughput of bytes and lines, or other
+    # unit counted
+    return {"name": name, "seconds": round(seconds, 4), "bytes": size,
+            unit: lines,
+            "mb_per_sec": round(size / 1024 / 1024 / seconds, 2)
+            if size and seconds else None,
+            f"{unit}_per_sec": round(lines / seconds)
+            if lines and seconds else None,
+            "peak_rss_kib": peak_rss}
+
+
+def run_benchmark(dir_corpus, dir_work):
+    # Generate log files, measure pipeline and each stage, return results
+    paths_logs, lines = generate_log_corpus(dir_corpus)
+    size = sum(os.path.getsize(path_log) for path_log in paths_logs)
+    results = []
+    seconds, peak_rss = _measure_pipeline(paths_logs, dir_work)
+    results.append(_get_result("pipeline", seconds, size, lines, peak_rss))
+    found, seconds, peak_rss = _measure_stage(_stage_discovery, dir_corpus)
+    results.append(_get_result("discovery", seconds, 0, 0, peak_rss))
+    results[-1]["files"] = found
+    issues, seconds, peak_rss = _measure_stage(_stage_matching, paths_logs)
+    results.append(_get_result("matching", seconds, size, lines, peak_rss))
+    results[-1]["issues"] = issues
+    _, seconds, peak_rss = _measure_stage(_stage_copy, paths_logs, dir_work)
+    results.append(_get_result("copy", seconds, size, lines, peak_rss))
+    seconds, _, peak_rss = _measure_stage(_stage_report, paths_logs,
+                                          dir_work)
+    results.append(_get_result("report", seconds, 0, issues, peak_rss,
+                               "issues"))
+    return results
+
+
+def _print_results(results):
+    for result in results:
+        print(f"{result['name']:<10} {result['seconds']:>9.3f} s "
+              f"{result['mb_per_sec'] or 0:>9.1f} MB/s "
+              f"{_get_rate(result)} "
+              f"{result['peak_rss_kib']:>9} KiB peak RSS")
+
+
+def _get_rate(result):
+    # Return lines/s of result, or issues/s if it counted issues
+    unit = "issues" if "issues_per_sec" in result else "lines"
+    return f"{result[f'{unit}_per_sec'] or 0:>11} {unit}/s"
+
+
+"""Entry point"""
+
+
+def main():
+    """Routine responsible for generating logs, measuring log_reader.py"""
+    _get_flag_arguments()
+    with tempfile.TemporaryDirectory() as dir_temp:
+        dir_corpus = DIR_CORPUS or Path(dir_temp) / "corpus"
+        dir_work = Path(dir_temp) / "work"
+        os.makedirs(dir_corpus, exist_ok=True)
+        os.makedirs(dir_work)
+        results = run_benchmark(dir_corpus, dir_work)
+    _print_results(results)
+    with open(FILE_RESULTS, "w") as file:
+        json.dump({"time": datetime.now().isoformat(),
+                   "settings": {"size_mb": SIZE_MB,
+                                "number_files": NUMBER_FILES,
+                                "issue_density": ISSUE_DENSITY,
+                                "line_length": LINE_LENGTH, "jobs": JOBS},
+                   "results": results}, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,13 +16,82 @@ Examples:
     `python3 log_reader.py -d /example -f boot.log,test.log -k error,warning`
     checks boot.log and test.log in /example for mentions of "error" and
     "warning", case-insensitive
+
+    `python3 log_reader.py -i` only checks bytes appended to the default log
+    files since the last incremental run, adding to the issue counts kept in
+    ./logs/checkpoints.json
+
+    `python3 log_reader.py -d /example -j 8` checks all files in /example in
+    8 parallel processes, splitting files over 64 MiB into chunks checked
+    in parallel
+
+    `python3 log_reader.py -r -f syslog` checks syslog and its rotated copies,
+    e.g. syslog.1 and syslog.2.gz, reading compressed copies as streams
+
+    `python3 log_reader.py --dedup` hardlinks copies of log files identical
+    to an earlier copy in ./logs instead of storing them again
+
+    `python3 log_reader.py -t --top-k 100` counts issues by template, e.g.
+    "disk /dev/<*> failed", keeping memory flat by counting only the 100
+    most common templates, approximately
+
+    `python3 log_reader.py --index issues.db` also stores issues found with
+    their keyword, template, count, file and byte offsets of first and last
+    occurrence in SQLite database issues.db, queried across runs with
+    `python3 log_reader.py --index issues.db --query failed --query-since
+    2026-10-12`
+
+    `python3 log_reader.py --follow --flush-interval 2` keeps checking lines
+    appended to the default log files as they are written, following them
+    across rotation, rewriting their issues files every 2 seconds
+
+    `python3 log_reader.py --since 2h` only checks lines of the last 2 hours,
+    by syslog or ISO8601 line timestamps, seeking to them by binary search.
+    `--since 2026-10-17T08:00 --until 2026-10-17T09:30` checks lines in
+    that window
+
+    `python3 log_reader.py -d /var/lib/docker/containers -R --max-depth 2
+    --include "*-json.log" --exclude "tmp*"` checks log files matching
+    *-json.log up to 2 directories deep, skipping files and directories
+    matching tmp*
+
+Other tools can scan without starting a process per scan by importing
+LogScanner, or through scan_daemon.py, which serves scans over a Unix socket
+from scanners kept warm between requests:
+
+    `scanner = log_reader.LogScanner(["error", "failed"])` then
+    `issues, issues_keyword = scanner.scan("/var/log/syslog")`
 """
 
 import argparse
+import asyncio
+import bz2
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import ctypes
+import fcntl
+from functools import partial
+import gzip
+import hashlib
+import heapq
+import json
+import lzma
+import mmap
 import os
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import deque
+import fnmatch
 import re
+import shutil
+import socket
+import sqlite3
+import struct
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # Global constants: general
 NONE = "NONE"
@@ -39,12 +108,89 @@ NAMES_FILES_TO_PARSE_ARG = NONE
 ISSUES_ARG = NONE
 ISSUES_ARG_DEFAULT = r"error|failed|warning"
 ISSUES_REGEX = re.compile(ISSUES_ARG_DEFAULT, re.IGNORECASE)
+INCREMENTAL = False
+JOBS = 1
+CHUNK_SIZE = 64 * 1024 * 1024
+ROTATED = False
+DEDUP_COPIES = False
+TEMPLATES = False
+TOP_K = 1000
+FILE_INDEX = NONE
+QUERY = NONE
+QUERY_SINCE = ""
+FOLLOW = False
+FLUSH_INTERVAL = 5.0
+TIME_SINCE = None
+TIME_UNTIL = None
+RECURSIVE = False
+MAX_DEPTH = None
+GLOBS_INCLUDE = []
+GLOBS_EXCLUDE = []
 
 # Global variables: general
 NAMES_FILES_TO_PARSE_DEFAULT = ["boot.log", "messages", "auth.log",
                                 "daemon.log", "kern.log"]
 FILES_LOGS_PATHS = []
 SUFFIXES_ACCEPTED = [".log", ".txt"]
+FILE_CHECKPOINTS = DIR_DEST / "checkpoints.json"
+CHECKPOINT_HEAD_SIZE = 1024
+SCANS_PENDING_PER_JOB = 4
+SCAN_BLOCK_SIZE = 4 * 1024 * 1024
+# Bytes at start of each block searched to estimate how many lines match,
+# fraction of lines matching above which every line is checked instead
+DENSITY_SAMPLE_SIZE = 64 * 1024
+DENSE_LINES_FRACTION = 0.75
+LITERAL_KEYWORD_REGEX = re.compile(r"[A-Za-z0-9_]+")
+UNSAFE_PREFILTER_REGEX = re.compile(r"[\^$]|\\[AZ]|\(\?<?[=!]")
+COMPRESSION_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open,
+                       ".zst": zstandard.open if zstandard else None}
+ROTATION_SUFFIX_REGEX = re.compile(r"[.-](\d+)$")
+FILE_COPIES_INDEX = DIR_DEST / "copies.json"
+COPIES_INDEX_LOCK = threading.Lock()
+COPY_THREADS = 2
+COPY_BLOCK_SIZE = 1024 * 1024
+# ioctl request cloning file extents (reflink), from linux/fs.h
+FICLONE = 0x40049409
+TEMPLATE_VARIABLE_REGEX = re.compile(r"\S*\d\S*")
+TEMPLATE_WILDCARD = "<*>"
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY, host TEXT NOT NULL, started TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS issues (
+    run_id INTEGER NOT NULL REFERENCES runs (id), file TEXT NOT NULL,
+    keyword TEXT NOT NULL, issue TEXT NOT NULL, template TEXT NOT NULL,
+    count INTEGER NOT NULL, first_offset INTEGER NOT NULL,
+    last_offset INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE INDEX IF NOT EXISTS issues_keyword
+    ON issues (keyword COLLATE NOCASE, run_id);
+CREATE INDEX IF NOT EXISTS issues_template ON issues (template, run_id);
+CREATE INDEX IF NOT EXISTS issues_file ON issues (file, run_id);
+"""
+FOLLOW_POLL_INTERVAL = 0.5
+# inotify event masks, from sys/inotify.h
+IN_MODIFY = 0x2
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+INOTIFY_MASK = IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | \
+    IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+# Line timestamps at start of lines, optionally bracketed: ISO8601, with or
+# without ":" as in copies' file names, or syslog's, without year
+TIME_ISO_REGEX = re.compile(
+    rb"\[?(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):?(\d{2})(?::?(\d{2}))?)?")
+TIME_SYSLOG_REGEX = re.compile(
+    rb"\[?([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2})")
+TIME_SEARCH_LENGTH = 48
+TIME_DURATION_REGEX = re.compile(r"(\d+)([smhd])")
+TIME_DURATION_UNITS = {"s": "seconds", "m": "minutes", "h": "hours",
+                       "d": "days"}
+MONTHS = {month: i for i, month in enumerate(
+    [b"Jan", b"Feb", b"Mar", b"Apr", b"May", b"Jun", b"Jul", b"Aug", b"Sep",
+     b"Oct", b"Nov", b"Dec"], start=1)}
 
 """Setup"""
 
@@ -53,6 +199,24 @@ def get_flag_arguments():
     global DIR_SOURCE_ARG
     global NAMES_FILES_TO_PARSE_ARG
     global ISSUES_ARG
+    global INCREMENTAL
+    global JOBS
+    global CHUNK_SIZE
+    global ROTATED
+    global DEDUP_COPIES
+    global TEMPLATES
+    global TOP_K
+    global FILE_INDEX
+    global QUERY
+    global QUERY_SINCE
+    global FOLLOW
+    global FLUSH_INTERVAL
+    global TIME_SINCE
+    global TIME_UNTIL
+    global RECURSIVE
+    global MAX_DEPTH
+    global GLOBS_INCLUDE
+    global GLOBS_EXCLUDE
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--directory", type=str,
@@ -63,13 +227,126 @@ def get_flag_arguments():
     parser.add_argument("-k", "--keyword", type=str,
                         help="issue keywords to find in files to parse, "
                              "comma-separated")
+    parser.add_argument("-i", "--incremental", action="store_true",
+                        help="only check lines appended since the last "
+                             "incremental run, adding to its issue counts")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="number of processes to check files in "
+                             "parallel (default: 1)")
+    parser.add_argument("-c", "--chunk-size", type=int,
+                        help="with --jobs, MiB of a file to check per "
+                             "process, splitting larger files (default: 64)")
+    parser.add_argument("-r", "--rotated", action="store_true",
+                        help="also check rotated, compressed copies of files "
+                             "to parse, e.g. syslog.1, syslog.2.gz")
+    parser.add_argument("--dedup", action="store_true",
+                        help="hardlink copies of log files identical to an "
+                             "earlier copy instead of storing them again")
+    parser.add_argument("-t", "--templates", action="store_true",
+                        help="count issues by template, replacing tokens with "
+                             "digits by <*>, keeping approximate counts of "
+                             "the most common templates only")
+    parser.add_argument("--top-k", type=int,
+                        help="with --templates, number of templates to keep "
+                             "counts of (default: 1000)")
+    parser.add_argument("--index", type=str,
+                        help="SQLite database to also store issues found in, "
+                             "with their files and offsets, for queries")
+    parser.add_argument("--query", type=str,
+                        help="with --index, print hosts, files with issues of "
+                             "this keyword or template instead of checking "
+                             "files")
+    parser.add_argument("--query-since", type=str,
+                        help="with --query, only count runs since this "
+                             "ISO8601 date or time")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep checking lines appended to files, "
+                             "following them across rotation, until "
+                             "interrupted")
+    parser.add_argument("--flush-interval", type=float,
+                        help="with --follow, seconds between rewriting "
+                             "issues files (default: 5)")
+    parser.add_argument("--since", type=str,
+                        help="only check lines timestamped from this time: "
+                             "ISO8601, syslog time or duration ago, e.g. 2h")
+    parser.add_argument("--until", type=str,
+                        help="only check lines timestamped before this time: "
+                             "ISO8601, syslog time or duration ago, e.g. 30m")
+    parser.add_argument("-R", "--recursive", action="store_true",
+                        help="also parse files in subdirectories of "
+                             "directory")
+    parser.add_argument("--max-depth", type=int,
+                        help="with --recursive, levels of subdirectories to "
+                             "parse files in (default: all)")
+    parser.add_argument("--include", type=str,
+                        help="with --directory, only parse files with names "
+                             "or paths matching these globs, comma-separated "
+                             "(default: *.log, *.txt)")
+    parser.add_argument("--exclude", type=str,
+                        help="with --directory, skip files, directories with "
+                             "names or paths matching these globs, "
+                             "comma-separated")
     args = parser.parse_args()
+    if (args.since or args.until) and (args.incremental or args.follow):
+        parser.error("--since, --until can't be used with --incremental, "
+                     "--follow")
     if args.directory:
         DIR_SOURCE_ARG = Path(args.directory)
     if args.files:
         NAMES_FILES_TO_PARSE_ARG = args.files
     if args.keyword:
         ISSUES_ARG = args.keyword
+    if args.incremental:
+        INCREMENTAL = args.incremental
+    if args.jobs:
+        JOBS = args.jobs
+    if args.chunk_size:
+        CHUNK_SIZE = args.chunk_size * 1024 * 1024
+    if args.rotated:
+        ROTATED = args.rotated
+    if args.dedup:
+        DEDUP_COPIES = args.dedup
+    if args.templates:
+        TEMPLATES = args.templates
+    if args.top_k:
+        TOP_K = args.top_k
+    if args.index:
+        FILE_INDEX = args.index
+    if args.query:
+        QUERY = args.query
+    if args.query_since:
+        QUERY_SINCE = args.query_since
+    if args.follow:
+        FOLLOW = args.follow
+    if args.flush_interval:
+        FLUSH_INTERVAL = args.flush_interval
+    if args.recursive:
+        RECURSIVE = args.recursive
+    if args.max_depth is not None:
+        MAX_DEPTH = args.max_depth
+    if args.include:
+        GLOBS_INCLUDE = get_list_from_comma_separated_string(args.include)
+    if args.exclude:
+        GLOBS_EXCLUDE = get_list_from_comma_separated_string(args.exclude)
+    try:
+        if args.since:
+            TIME_SINCE = _get_time_from_arg(args.since)
+        if args.until:
+            TIME_UNTIL = _get_time_from_arg(args.until)
+    except ValueError as error:
+        parser.error(str(error))
+
+
+def _get_time_from_arg(time_arg):
+    # Return time from duration ago, e.g. 2h, or timestamp
+    match = TIME_DURATION_REGEX.fullmatch(time_arg)
+    if match is not None:
+        return datetime.now() - timedelta(
+            **{TIME_DURATION_UNITS[match.group(2)]: int(match.group(1))})
+    time = _get_line_time(time_arg.encode())
+    if time is None:
+        raise ValueError(f"time not recognised: {time_arg}")
+    return time
 
 
 def _set_source_dir():
@@ -94,14 +371,20 @@ def _set_issue_keywords():
     # Replace default issue keywords of logs with user selected
     if ISSUES_ARG is not NONE:
         issues_keywords_list = get_list_from_comma_separated_string(ISSUES_ARG)
-        issues_keywords_list = [keyword for keyword in issues_keywords_list
-                                if keyword]
-        issues_keywords = r"|".join(issues_keywords_list)
-        ISSUES_REGEX = re.compile(issues_keywords, re.IGNORECASE)
+        ISSUES_REGEX = _get_issues_regex(issues_keywords_list)
+
+
+def _get_issues_regex(issues_keywords_list):
+    # Return case-insensitive regex matching any of issue keywords
+    issues_keywords_list = [keyword for keyword in issues_keywords_list
+                            if keyword]
+    issues_keywords = r"|".join(issues_keywords_list)
+    return re.compile(issues_keywords, re.IGNORECASE)
 
 
 def _set_files_to_parse():
-    # Set files to parse based on whether file, dir, flags provided
+    # Set files to parse based on whether file, dir flags provided. Files in
+    # dir are found while parsing
     global NAMES_FILES_TO_PARSE
     global NAMES_FILES_TO_PARSE_ARG
     global NONE
@@ -110,24 +393,110 @@ def _set_files_to_parse():
         files_list = \
             get_list_from_comma_separated_string(NAMES_FILES_TO_PARSE_ARG)
         NAMES_FILES_TO_PARSE = files_list
-    elif DIR_SOURCE_ARG is not NONE:
-        set_files_from_user_dir()
-    else:
+    elif DIR_SOURCE_ARG is DIR_SOURCE_NONE:
         NAMES_FILES_TO_PARSE = NAMES_FILES_TO_PARSE_DEFAULT
 
 
-def set_files_from_user_dir():
-    # Get all files to parse from directory from user input flag
-    global DIR_SOURCE
-    global NAMES_FILES_TO_PARSE
-    global SUFFIXES_ACCEPTED
-
-    path_source = Path(DIR_SOURCE).glob('*/')
-
-    for file in path_source:
-        if file.is_file() and file.suffix in SUFFIXES_ACCEPTED and \
-                NAMES_FILES_TO_PARSE_ARG is NONE:
-            NAMES_FILES_TO_PARSE.append(file.name)
+def _get_log_file_paths():
+    # Yield paths of log files to parse: all found in dir from user input
+    # flag if no files named, else named files found in source dir
+    if NAMES_FILES_TO_PARSE_ARG is NONE and \
+            DIR_SOURCE_ARG is not DIR_SOURCE_NONE:
+        max_depth = MAX_DEPTH if RECURSIVE or MAX_DEPTH is not None else 0
+        yield from find_log_files(DIR_SOURCE, max_depth)
+        return
+    names_log_files = NAMES_FILES_TO_PARSE
+    if ROTATED:
+        names_log_files = _add_rotated_file_names(names_log_files)
+    yield from _set_abs_log_file_paths(names_log_files)
+
+
+def find_log_files(dir_source, max_depth):
+    # Yield paths of log files in dir_source tree up to max_depth levels of
+    # subdirectories (None for all) in name order, listing each directory
+    # once and using file types cached in its entries
+    dirs = [(Path(dir_source), "", 0)]
+    while dirs:
+        dir_path, dir_relative, depth = dirs.pop()
+        try:
+            with os.scandir(dir_path) as dir_entries:
+                entries = sorted(dir_entries, key=lambda entry: entry.name)
+        except OSError as error:
+            print(f"Directory {dir_path} will not be processed: {error}")
+            continue
+        sub_dirs = []
+        for entry in entries:
+            path_relative = f"{dir_relative}{entry.name}"
+            if _is_glob_match(entry.name, path_relative, GLOBS_EXCLUDE):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if max_depth is None or depth < max_depth:
+                    sub_dirs.append((Path(entry.path), f"{path_relative}/",
+                                     depth + 1))
+            elif entry.is_file() and \
+                    _is_included_log_file(entry.name, path_relative) and \
+                    _is_compression_supported(Path(entry.path)):
+                yield Path(entry.path)
+        # Walk sub-directories next, in name order
+        dirs.extend(reversed(sub_dirs))
+
+
+def _is_included_log_file(name, path_relative):
+    # Return whether file matches include globs, or has accepted suffix if
+    # none
+    if GLOBS_INCLUDE:
+        return _is_glob_match(name, path_relative, GLOBS_INCLUDE)
+    return _is_accepted_log_name(name)
+
+
+def _is_glob_match(name, path_relative, globs):
+    return any(fnmatch.fnmatchcase(name, glob) or
+               fnmatch.fnmatchcase(path_relative, glob) for glob in globs)
+
+
+def _is_accepted_log_name(name):
+    # Return whether file has accepted suffix, ignoring rotation and
+    # compression suffixes if checking rotated files
+    path = Path(name)
+    if ROTATED:
+        if path.suffix in COMPRESSION_OPENERS:
+            path = path.with_suffix("")
+        path = Path(ROTATION_SUFFIX_REGEX.sub("", path.name))
+    return path.suffix in SUFFIXES_ACCEPTED
+
+
+def _add_rotated_file_names(names_log_files):
+    # Return file names with rotated copies of each in source dir after it
+    names_in_dir = os.listdir(DIR_SOURCE)
+    names_with_rotated = []
+    for name in names_log_files:
+        if name in names_with_rotated:
+            continue
+        names_with_rotated.append(name)
+        rotation_regex = re.compile(
+            rf"{re.escape(name)}[.-](\d+)(\.gz|\.bz2|\.xz|\.zst)?")
+        rotations = []
+        for name_in_dir in names_in_dir:
+            match = rotation_regex.fullmatch(name_in_dir)
+            if match is None:
+                continue
+            if not _is_compression_supported(DIR_SOURCE / name_in_dir):
+                continue
+            rotations.append((int(match.group(1)), name_in_dir))
+        names_with_rotated.extend(name_rotated for _, name_rotated
+                                  in sorted(rotations))
+    return names_with_rotated
+
+
+def _is_compression_supported(path):
+    # Return whether file is not compressed or can be decompressed, saying
+    # why it will not be processed if not
+    if path.suffix in COMPRESSION_OPENERS and \
+            COMPRESSION_OPENERS[path.suffix] is None:
+        print(f"Log file {path} will not be processed as zstandard package "
+              f"not installed")
+        return False
+    return True
 
 
 def _create_dest_dir(dir_path):
@@ -137,87 +506,472 @@ def _create_dest_dir(dir_path):
 
 
 def _set_abs_log_file_paths(names_log_files):
-    # Return updated list with absolute file paths for log files
-    log_files_abs = []
-    for i, file in enumerate(names_log_files):
+    # Yield file paths for log files found in source dir
+    for file in names_log_files:
         if Path(DIR_SOURCE / file).is_file():
-            log_files_abs.append(DIR_SOURCE / file)
+            if _is_compression_supported(DIR_SOURCE / file):
+                yield DIR_SOURCE / file
         else:
             print(f"Log file {DIR_SOURCE}/{file} will not be processed as "
                   f"not found")
-    return log_files_abs
-
-
-def _remove_nonexistent_files(files_logs_paths):
-    # Return list without log files which cannot be found
-    for log_file in files_logs_paths:
-        if not log_file.is_file():
-            print(f"Log file {log_file} not found. Removing from log "
-                  f"reading")
-            files_logs_paths.remove(log_file)
-    return files_logs_paths
 
 
 def _iterate_check_each_file(all_logfiles, regex):
     # Routine to call functionality to check all logfiles for issues
+    checkpoints = _load_checkpoints() if INCREMENTAL else {}
+    # Find checkpoints of files since moved by rotation
+    checkpoints_by_inode = {checkpoint["inode"]: checkpoint
+                            for checkpoint in checkpoints.values()}
+    window = (TIME_SINCE, TIME_UNTIL) \
+        if TIME_SINCE is not None or TIME_UNTIL is not None else None
+    engine = _get_match_engine(regex, TOP_K if TEMPLATES else None,
+                               FILE_INDEX is not NONE, window)
+    executor = ProcessPoolExecutor(max_workers=JOBS) if JOBS > 1 else None
+    # Copy log files in background threads while scanning continues
+    copier = ThreadPoolExecutor(max_workers=COPY_THREADS)
+    copies_index = _load_copies_index() if DEDUP_COPIES else None
+    index = _start_index_run(FILE_INDEX) if FILE_INDEX is not NONE else None
+    # Start scans of files as found, report in parent in file order, keeping
+    # a bounded number of scans pending
+    scans = deque()
     for file in all_logfiles:
+        scans.append((file, _start_log_scan(
+            file, engine, checkpoints, checkpoints_by_inode, executor,
+            INCREMENTAL, CHUNK_SIZE)))
+        if len(scans) > JOBS * SCANS_PENDING_PER_JOB:
+            _check_file(*scans.popleft(), checkpoints, copier, copies_index,
+                        index)
+    while scans:
+        _check_file(*scans.popleft(), checkpoints, copier, copies_index, index)
+    if executor is not None:
+        executor.shutdown()
+    if INCREMENTAL:
+        _save_checkpoints(checkpoints)
+    copier.shutdown()
+    if DEDUP_COPIES:
+        _save_copies_index(copies_index)
+    if index is not None:
+        index[0].close()
+
+
+def _start_log_scan(file_to_read, engine, checkpoints, checkpoints_by_inode,
+                    executor, incremental, chunk_size):
+    # Return file's checkpoint after scan, pending scans of its unread byte
+    # ranges, whether file rescanned. None if file cannot be accessed. If
+    # incremental, leaves incomplete last line for next scan. Files over
+    # chunk_size are split if scanned in parallel
+    _, _, _, _, _, window = engine
+    compressed = file_to_read.suffix in COMPRESSION_OPENERS
+    try:
+        with open(file_to_read, "rb") as file:
+            checkpoint_previous = _find_checkpoint(
+                file_to_read, file, checkpoints, checkpoints_by_inode)
+            checkpoint = _get_checkpoint(file, checkpoint_previous,
+                                         compressed)
+            if compressed:
+                # Compressed files can't be resumed, read whole if changed
+                size = os.fstat(file.fileno()).st_size
+                ranges = [(0, size)] if checkpoint["offset"] < size else []
+            else:
+                # Split large files into chunks only if scanned in parallel
+                ranges = _get_scan_ranges(
+                    file, checkpoint["offset"],
+                    chunk_size if executor else None, incremental, window)
+            offset = ranges[-1][1] if ranges else checkpoint["offset"]
+            checkpoint = _get_updated_checkpoint(file, checkpoint, offset)
+    except PermissionError:
+        return None
+    get_log_issues = \
+        _get_compressed_log_issues if compressed else _get_log_issues
+    if executor is None:
+        range_scans = [partial(get_log_issues, file_to_read, engine, *range_)
+                       for range_ in ranges]
+    else:
+        range_scans = [executor.submit(get_log_issues, file_to_read, engine,
+                                       *range_).result
+                       for range_ in ranges]
+    rescanned = checkpoint_previous is not None and \
+        checkpoint["issues"] is not checkpoint_previous["issues"]
+    return checkpoint, range_scans, rescanned
+
+
+def _check_file(file, scan, checkpoints, copier, copies_index, index):
+    # Report issues from scans of file's byte ranges, keeping its checkpoint
+    print(f"Start read: {file}")
+    try:
+        if scan is None:
+            raise PermissionError
+        checkpoint, range_scans, rescanned = scan
+        issues_new, issues_new_keyword, issues_new_details = \
+            _get_scan_issues(range_scans)
+    except PermissionError:
+        print(f"You require administrator privileges to access {file}")
+        return
+    if rescanned:
+        print(f"{file} rotated or truncated since last read, reading from "
+              f"start")
+    # Add issues found in this run to checkpoint's
+    _add_checkpoint_issues(checkpoint, issues_new, issues_new_keyword,
+                           TOP_K if TEMPLATES else None)
+    if issues_new:
+        _write_log_file_reports(file, checkpoint, copier, copies_index)
+        if index is not None:
+            write_index_issues(index, file, issues_new, issues_new_details)
+    checkpoints[os.path.abspath(file)] = checkpoint
+
+
+def _get_scan_issues(range_scans):
+    # Return issues found by scans of file's byte ranges, merged
+    issues_new = {}
+    issues_new_keyword = {}
+    issues_new_details = {}
+    for get_range_issues in range_scans:
+        issues_found, issues_found_keyword, issues_found_details = \
+            get_range_issues()
+        _merge_issues(issues_new, issues_found)
+        _merge_issues(issues_new_keyword, issues_found_keyword)
+        _merge_issue_details(issues_new_details, issues_found_details)
+    return issues_new, issues_new_keyword, issues_new_details
+
+
+def _add_checkpoint_issues(checkpoint, issues_new, issues_new_keyword, top_k):
+    # Add issues found to checkpoint's, keeping top_k templates of both if
+    # counting templates
+    _merge_issues(checkpoint["issues"], issues_new)
+    _merge_issues(checkpoint["issues_keyword"], issues_new_keyword)
+    if top_k is not None:
+        _prune_top_k(issues_new, top_k)
+        _prune_top_k(checkpoint["issues"], top_k)
+
+
+def _get_scan_ranges(file, start, chunk_size, incremental, window):
+    # Return newline-aligned byte ranges of file from start, each of about
+    # chunk_size bytes, or one range if no chunk_size. Only complete lines
+    # if incremental, only lines in window of since, until times if set
+    size = os.fstat(file.fileno()).st_size
+    if start >= size:
+        return []
+    ranges = []
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as log_map:
+        end = size
+        # Leave incomplete last line for next incremental run
+        if incremental:
+            end = log_map.rfind(b"\n", start, size) + 1
+        since, until = window or (None, None)
+        if until is not None:
+            end = _find_time_offset(log_map, start, end, until)
+        # Untimestamped lines are taken as in any window, so only narrow to
+        # since if a line is timestamped
+        if since is not None and \
+                _get_next_line_time(log_map, start, end)[0] is not None:
+            start = _find_time_offset(log_map, start, end, since)
+        while start < end:
+            split = end
+            if chunk_size and start + chunk_size < end:
+                split = log_map.find(b"\n", start + chunk_size, end) + 1 \
+                    or end
+            ranges.append((start, split))
+            start = split
+    return ranges
+
+
+def _find_time_offset(log_map, start, end, time):
+    # Return offset of first line in log_map[start:end] timestamped at or
+    # after time by binary search, lines being in time order, end if none.
+    # Lines without timestamp continue the timestamped line before them
+    low = start
+    high = end
+    offset = end
+    while low < high:
+        middle = (low + high) // 2
+        line_start = log_map.rfind(b"\n", start, middle) + 1 or start
+        line_time, time_start, line_end = _get_next_line_time(
+            log_map, line_start, end)
+        if line_time is None:
+            high = line_start
+        elif line_time >= time:
+            offset = time_start
+            high = line_start
+        else:
+            low = line_end
+    return offset
+
+
+def _get_next_line_time(log_map, start, end):
+    # Return time of first timestamped line in log_map[start:end] and offsets
+    # of its start and end, None if no line timestamped
+    while start < end:
+        line_end = log_map.find(b"\n", start, end) + 1 or end
+        line_time = _get_line_time(
+            log_map[start:min(start + TIME_SEARCH_LENGTH, line_end)])
+        if line_time is not None:
+            return line_time, start, line_end
+        start = line_end
+    return None, end, end
+
+
+def _get_line_time(line):
+    # Return time of ISO8601 or syslog timestamp at start of line, None if
+    # not timestamped or not a valid time. Syslog times are taken as of the
+    # last year
+    head = line[:TIME_SEARCH_LENGTH]
+    match = TIME_ISO_REGEX.match(head)
+    if match is not None:
         try:
-            _get_log_issues(file, regex)
-        except PermissionError:
-            print(f"You require administrator privileges to access {file}")
+            return datetime(*(int(part or 0) for part in match.groups()))
+        except ValueError:
+            pass
+    match = TIME_SYSLOG_REGEX.match(head)
+    if match is not None and match.group(1) in MONTHS:
+        now = datetime.now()
+        try:
+            time = datetime(now.year, MONTHS[match.group(1)],
+                            *(int(part) for part in match.groups()[1:]))
+            if time > now + timedelta(days=1):
+                time = time.replace(year=now.year - 1)
+            return time
+        except ValueError:
+            pass
+    return None
+
+
+def _is_line_in_time_window(line, window):
+    # Return whether line timestamped in window of since, until times, or
+    # not timestamped
+    line_time = _get_line_time(line)
+    since, until = window
+    return line_time is None or \
+        (since is None or line_time >= since) and \
+        (until is None or line_time < until)
+
+
+"""Checkpoints"""
+
+
+def _load_checkpoints():
+    # Return per-file checkpoints persisted by previous incremental runs
+    try:
+        with open(FILE_CHECKPOINTS) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_checkpoints(checkpoints):
+    # Persist checkpoints, replacing old ones only once fully written
+    path_tmp = Path(f"{FILE_CHECKPOINTS}.tmp")
+    with open(path_tmp, "w") as file:
+        json.dump(checkpoints, file)
+    os.replace(path_tmp, FILE_CHECKPOINTS)
+
+
+def _get_head_fingerprint(file, head_size):
+    # Return hash of first head_size bytes of file, identifying its contents
+    file.seek(0)
+    return hashlib.blake2b(file.read(head_size), digest_size=16).hexdigest()
+
+
+def _find_checkpoint(file_to_read, file, checkpoints, checkpoints_by_inode):
+    # Return checkpoint of file, or a copy of checkpoint of file it was
+    # rotated from if moved
+    checkpoint = checkpoints.get(os.path.abspath(file_to_read))
+    inode = os.fstat(file.fileno()).st_ino
+    if (checkpoint is None or checkpoint["inode"] != inode) and \
+            inode in checkpoints_by_inode:
+        checkpoint_moved = checkpoints_by_inode[inode]
+        checkpoint = dict(
+            checkpoint_moved, issues=dict(checkpoint_moved["issues"]),
+            issues_keyword=dict(checkpoint_moved["issues_keyword"]))
+    return checkpoint
+
+
+def _get_checkpoint(file, checkpoint, compressed):
+    # Return checkpoint to resume file from, new if rotated or truncated, or
+    # if compressed and changed at all
+    stat = os.fstat(file.fileno())
+    if checkpoint is not None and checkpoint["inode"] == stat.st_ino and \
+            (checkpoint["offset"] == stat.st_size if compressed
+             else checkpoint["offset"] <= stat.st_size) and \
+            checkpoint["head_hash"] == \
+            _get_head_fingerprint(file, checkpoint["head_size"]):
+        return checkpoint
+    return {"inode": stat.st_ino, "offset": 0, "head_size": 0,
+            "head_hash": _get_head_fingerprint(file, 0),
+            "issues": {}, "issues_keyword": {}}
+
+
+def _get_updated_checkpoint(file, checkpoint, offset):
+    # Return checkpoint with offset to read up to, fingerprint of file head
+    head_size = min(offset, CHECKPOINT_HEAD_SIZE)
+    return dict(checkpoint, offset=offset, head_size=head_size,
+                head_hash=_get_head_fingerprint(file, head_size))
 
 
 """Find issues, create parsed log files"""
 
 
-def _get_log_issues(file_to_read, regex):
-    # Find lines in log file matching issue keywords
-
+def _get_log_issues(file_to_read, engine, start, end):
+    # Find lines in byte range of log file matching issue keywords
     # Collect entire line of log message with issue
-    issues_found = {}
+    issues_found = _get_issue_counts(engine)
     # Collect only issue keyword
     issues_found_keyword = {}
-    logs_copy_made = False
-    print(f"Start read: {file_to_read}")
-    with open(file_to_read, "r") as file:
-        for i, line in enumerate(file):
-            cols = [col.strip() for col in line.split(":") if col]
-            for col in cols:
-                if regex.search(col) is not None:
-                    # Create copy of log file
-                    if not logs_copy_made:
-                        logs_copy_file = _write_log_file_copy(file_to_read)
-                        logs_issues_file = \
-                            _get_logs_issues_filename(logs_copy_file)
-                        logs_issues_keyword_file = \
-                            _get_logs_issues_keywords_filename(logs_copy_file)
-                        logs_copy_made = logs_copy_file is not None
-                        print(f"\nIssues found in {file_to_read.name}:\n"
-                              f"See {logs_copy_file} directory for logs copy\n"
-                              f"See {logs_issues_file} directory for issues")
-                    # If issue not processed before, add
-                    if col not in issues_found:
-                        issues_found.update({col: 1})
-                        issues_found_keyword.update({regex.findall(col)[0]: 1})
-                    # Increment count of issues processed
-                    else:
-                        issues_found[col] += 1
-                        issues_found_keyword[regex.findall(col)[0]] += 1
-    file.close()
-    if issues_found:
-        write_log_file_issues(logs_issues_file, _sort_issues(issues_found))
-        write_log_file_issues_short(logs_issues_keyword_file,
-                                    _sort_issues(issues_found_keyword))
-
-
-def _write_log_file_copy(file_to_copy):
-    # Create copy of passed log file
+    # Collect keyword, offsets of first and last line with issue if indexing
+    issues_found_details = {}
+    with open(file_to_read, "rb") as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as log_map:
+        for line_start, line_end in \
+                _get_candidate_lines(log_map, engine, start, end):
+            _count_line_issues(log_map[line_start:line_end], line_start,
+                               engine, issues_found, issues_found_keyword,
+                               issues_found_details)
+    return issues_found, issues_found_keyword, issues_found_details
+
+
+def _get_compressed_log_issues(file_to_read, engine, start, end):
+    # Find lines in compressed log file matching issue keywords, streaming it
+    # decompressed. Byte range is of compressed file, which is always whole
+    issues_found = _get_issue_counts(engine)
+    issues_found_keyword = {}
+    issues_found_details = {}
+    remainder = b""
+    # Offset of block in decompressed file
+    offset = 0
+    with COMPRESSION_OPENERS[file_to_read.suffix](file_to_read, "rb") as file:
+        while True:
+            block_read = file.read(SCAN_BLOCK_SIZE)
+            block = remainder + block_read
+            # Keep incomplete last line of block for next block
+            block_end = block.rfind(b"\n") + 1 if block_read else len(block)
+            _count_block_issues(block, offset, block_end, engine, issues_found,
+                                issues_found_keyword, issues_found_details)
+            if not block_read:
+                break
+            remainder = block[block_end:]
+            offset += block_end
+    return issues_found, issues_found_keyword, issues_found_details
+
+
+def _count_block_issues(block, offset, end, engine, issues_found,
+                        issues_found_keyword, issues_found_details):
+    # Count issues in lines of block[:end], block being at offset of file
+    for line_start, line_end in _get_candidate_lines(block, engine, 0, end):
+        _count_line_issues(block[line_start:line_end], offset + line_start,
+                           engine, issues_found, issues_found_keyword,
+                           issues_found_details)
+
+
+def _write_log_file_reports(file_to_read, checkpoint, copier, copies_index):
+    # Start copy of log file, write its issues found
+    logs_copy_file = _write_log_file_copy(file_to_read, copier, copies_index)
+    logs_issues_file = _get_logs_issues_filename(logs_copy_file)
+    logs_issues_keyword_file = \
+        _get_logs_issues_keywords_filename(logs_copy_file)
+    print(f"\nIssues found in {file_to_read}:\n"
+          f"See {logs_copy_file} directory for logs copy\n"
+          f"See {logs_issues_file} directory for issues")
+    write_log_file_issues(logs_issues_file,
+                          _sort_issues(checkpoint["issues"]))
+    write_log_file_issues_short(logs_issues_keyword_file,
+                                _sort_issues(checkpoint["issues_keyword"]))
+
+
+def _write_log_file_copy(file_to_copy, copier, copies_index):
+    # Start copy of passed log file in copier, return path of copy
+    path_copy = _get_log_file_copy_path(file_to_copy)
+    copier.submit(_copy_log_file, file_to_copy, path_copy, copies_index)
+    return path_copy
+
+
+def _get_log_file_copy_path(file_to_copy):
+    # Return timestamped path for copy of log file in destination dir, in
+    # the subdirectories file is in in source dir so files of the same name
+    # get their own copies and reports, creating them
     time_stamp = _get_formatted_timestamp()
+    try:
+        dir_relative = file_to_copy.parent.relative_to(DIR_SOURCE)
+    except ValueError:
+        dir_relative = Path()
     filename = file_to_copy.name.replace(file_to_copy.suffix, "")
     dest_filename = f"{filename}_{time_stamp}{file_to_copy.suffix}"
-    Path(DIR_DEST / dest_filename) \
-        .write_text(Path(file_to_copy).read_text())
-    return Path(DIR_DEST / dest_filename)
+    _create_dest_dir(DIR_DEST / dir_relative)
+    return Path(DIR_DEST / dir_relative / dest_filename)
+
+
+def _copy_log_file(file_to_copy, path_copy, copies_index):
+    # Copy log file, or hardlink an identical earlier copy if deduplicating
+    try:
+        if copies_index is not None:
+            content_hash = _get_content_hash(file_to_copy)
+            with COPIES_INDEX_LOCK:
+                path_identical = copies_index.get(content_hash)
+                if path_identical is None or \
+                        not Path(path_identical).is_file():
+                    copies_index[content_hash] = str(path_copy)
+                    path_identical = None
+            if path_identical is not None:
+                os.link(path_identical, path_copy)
+                return
+        _copy_file_contents(file_to_copy, path_copy)
+    except OSError as error:
+        print(f"Could not copy {file_to_copy} to {path_copy}: {error}")
+
+
+def _copy_file_contents(path_source, path_dest):
+    # Copy file in kernel, sharing extents if filesystem supports reflinks
+    with open(path_source, "rb") as source, open(path_dest, "wb") as dest:
+        try:
+            fcntl.ioctl(dest.fileno(), FICLONE, source.fileno())
+            return
+        except OSError:
+            pass
+        for copy_range in (os.copy_file_range, _sendfile):
+            try:
+                while copy_range(source.fileno(), dest.fileno(),
+                                 COPY_BLOCK_SIZE):
+                    pass
+                return
+            except OSError:
+                # Restart with next method if unsupported between files
+                source.seek(0)
+                dest.seek(0)
+                dest.truncate()
+        shutil.copyfileobj(source, dest, COPY_BLOCK_SIZE)
+
+
+def _sendfile(source_fd, dest_fd, count):
+    # Copy count bytes from source's position, advancing it, like
+    # os.copy_file_range
+    offset = os.lseek(source_fd, 0, os.SEEK_CUR)
+    copied = os.sendfile(dest_fd, source_fd, offset, count)
+    os.lseek(source_fd, offset + copied, os.SEEK_SET)
+    return copied
+
+
+def _get_content_hash(path):
+    # Return hash of file contents, read in blocks
+    content_hash = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(partial(file.read, COPY_BLOCK_SIZE), b""):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def _load_copies_index():
+    # Return hashes of contents of earlier log file copies, with their paths
+    try:
+        with open(FILE_COPIES_INDEX) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_copies_index(copies_index):
+    # Persist copies index, replacing old one only once fully written
+    path_tmp = Path(f"{FILE_COPIES_INDEX}.tmp")
+    with open(path_tmp, "w") as file:
+        json.dump(copies_index, file)
+    os.replace(path_tmp, FILE_COPIES_INDEX)
 
 
 def _get_formatted_timestamp():
@@ -232,6 +986,9 @@ def _get_logs_issues_filename(log_file_copy):
     log_path = Path(log_file_copy)
     suffix = log_path.suffix
     issues_path = str(log_path).replace(f"{suffix}", "")
+    # Write issues of compressed log files as plain text
+    if suffix in COMPRESSION_OPENERS:
+        suffix = ".log"
     issues_path = f"{issues_path}_issues{suffix}"
     return issues_path
 
@@ -241,6 +998,9 @@ def _get_logs_issues_keywords_filename(log_file_copy):
     log_path = Path(log_file_copy)
     suffix = log_path.suffix
     issues_path = str(log_path).replace(f"{suffix}", "")
+    # Write issues of compressed log files as plain text
+    if suffix in COMPRESSION_OPENERS:
+        suffix = ".log"
     issues_path = f"{issues_path}_issues_keywords{suffix}"
     return issues_path
 
@@ -262,9 +1022,554 @@ def write_log_file_issues_short(logs_issues_file, issues_found):
 
 
 def _delete_dir_if_empty(dir_dest):
+    # Delete dest dir, and subdirectories made for copies, if no files
+    # written in them
     for _, _, files in os.walk(dir_dest):
-        if not files:
-            dir_dest.rmdir()
+        if files:
+            return
+    shutil.rmtree(dir_dest)
+
+
+"""Follow files"""
+
+
+def _follow_each_file(all_logfiles, regex):
+    # Routine to check lines appended to all logfiles until interrupted
+    engine = _get_match_engine(regex, TOP_K if TEMPLATES else None, False,
+                               None)
+    try:
+        asyncio.run(_follow_files(all_logfiles, engine))
+    except KeyboardInterrupt:
+        print("Stopped following log files")
+
+
+async def _follow_files(all_logfiles, engine):
+    # Check lines appended to files when inotify reports changes, or every
+    # FOLLOW_POLL_INTERVAL if unavailable, rewriting issues files with counts
+    # every FLUSH_INTERVAL
+    loop = asyncio.get_running_loop()
+    followed = {}
+    for file in all_logfiles:
+        try:
+            followed[os.path.abspath(file)] = _start_following(file)
+        except PermissionError:
+            print(f"You require administrator privileges to access {file}")
+    pending = set()
+    changed = asyncio.Event()
+    inotify_fd, watches = _start_inotify(
+        {os.path.dirname(path) for path in followed})
+    if inotify_fd is not None:
+        loop.add_reader(inotify_fd, _read_inotify_events, inotify_fd, watches,
+                        followed, pending, changed)
+    print(f"Following {len(followed)} log files "
+          f"{'with inotify' if inotify_fd is not None else 'by polling'}, "
+          f"interrupt to stop")
+    time_flush = loop.time() + FLUSH_INTERVAL
+    try:
+        while True:
+            timeout = max(time_flush - loop.time(), 0)
+            if inotify_fd is None:
+                timeout = min(timeout, FOLLOW_POLL_INTERVAL)
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                # Check all files, also catching rotations inotify missed
+                pending.update(followed)
+            changed.clear()
+            for path in pending:
+                _read_followed_file(followed[path], engine)
+            pending.clear()
+            if loop.time() >= time_flush:
+                _flush_followed_issues(followed.values())
+                time_flush = loop.time() + FLUSH_INTERVAL
+    finally:
+        if inotify_fd is not None:
+            loop.remove_reader(inotify_fd)
+            os.close(inotify_fd)
+        _flush_followed_issues(followed.values())
+        for state in followed.values():
+            state["file"].close()
+
+
+def _start_following(file_to_follow):
+    # Return state of file followed from its end, with its issues files
+    file = open(file_to_follow, "rb")
+    file.seek(0, os.SEEK_END)
+    path_copy = _get_log_file_copy_path(file_to_follow)
+    return {"path": file_to_follow, "file": file,
+            "inode": os.fstat(file.fileno()).st_ino, "offset": file.tell(),
+            "remainder": b"", "issues": _TopKCounts() if TEMPLATES else {},
+            "issues_keyword": {},
+            "flushed": True,
+            "issues_file": _get_logs_issues_filename(path_copy),
+            "issues_keyword_file":
+                _get_logs_issues_keywords_filename(path_copy)}
+
+
+def _read_followed_file(state, engine):
+    # Count issues in lines appended to followed file, reopening it if
+    # rotated, from start if truncated
+    try:
+        stat = os.stat(state["path"])
+    except FileNotFoundError:
+        # Keep reading rotated file until new file created
+        stat = None
+    if stat is not None and stat.st_ino != state["inode"]:
+        _read_followed_lines(state, engine)
+        state["file"].close()
+        state["file"] = open(state["path"], "rb")
+        state["inode"] = os.fstat(state["file"].fileno()).st_ino
+        state["offset"] = 0
+        state["remainder"] = b""
+        print(f"{state['path']} rotated, following new file")
+    elif stat is not None and \
+            stat.st_size < state["offset"] + len(state["remainder"]):
+        state["file"].seek(0)
+        state["offset"] = 0
+        state["remainder"] = b""
+        print(f"{state['path']} truncated, following from start")
+    _read_followed_lines(state, engine)
+
+
+def _read_followed_lines(state, engine):
+    # Count issues in complete lines appended to followed file
+    issues_before = sum(state["issues_keyword"].values())
+    while True:
+        block_read = state["file"].read(SCAN_BLOCK_SIZE)
+        if not block_read:
+            break
+        block = state["remainder"] + block_read
+        # Keep incomplete last line until rest of it written
+        block_end = block.rfind(b"\n") + 1
+        _count_block_issues(block, state["offset"], block_end, engine,
+                            state["issues"], state["issues_keyword"], None)
+        state["remainder"] = block[block_end:]
+        state["offset"] += block_end
+    issues_new = sum(state["issues_keyword"].values()) - issues_before
+    if issues_new:
+        if TEMPLATES:
+            _prune_top_k(state["issues"], TOP_K)
+        state["flushed"] = False
+        print(f"{issues_new} new issues in {state['path']}, see "
+              f"{state['issues_file']}")
+
+
+def _flush_followed_issues(states):
+    # Rewrite issues files of followed files with new issues since last flush
+    for state in states:
+        if state["flushed"]:
+            continue
+        for path_issues, issues, write_issues in (
+                (state["issues_file"], state["issues"],
+                 write_log_file_issues),
+                (state["issues_keyword_file"], state["issues_keyword"],
+                 write_log_file_issues_short)):
+            path_tmp = f"{path_issues}.tmp"
+            write_issues(path_tmp, _sort_issues(issues))
+            os.replace(path_tmp, path_issues)
+        state["flushed"] = True
+
+
+def _start_inotify(dirs):
+    # Return inotify file descriptor watching dirs, with dir of each watch
+    # descriptor. None if inotify unavailable
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        inotify_fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, {}
+    if inotify_fd < 0:
+        return None, {}
+    watches = {}
+    for dir_watched in dirs:
+        watch = libc.inotify_add_watch(inotify_fd, os.fsencode(dir_watched),
+                                       INOTIFY_MASK)
+        if watch < 0:
+            os.close(inotify_fd)
+            return None, {}
+        watches[watch] = dir_watched
+    return inotify_fd, watches
+
+
+def _read_inotify_events(inotify_fd, watches, followed, pending, changed):
+    # Add followed files with inotify events to pending, signalling changed
+    try:
+        events = os.read(inotify_fd, 64 * 1024)
+    except BlockingIOError:
+        return
+    offset = 0
+    while offset < len(events):
+        watch, mask, _, length = INOTIFY_EVENT.unpack_from(events, offset)
+        offset += INOTIFY_EVENT.size
+        name = os.fsdecode(events[offset:offset + length].rstrip(b"\0"))
+        offset += length
+        if mask & IN_Q_OVERFLOW:
+            pending.update(followed)
+            continue
+        path = os.path.join(watches.get(watch, ""), name)
+        if path in followed:
+            pending.add(path)
+    if pending:
+        changed.set()
+
+
+"""Match engine"""
+
+
+def _get_match_engine(regex, top_k, details, window):
+    # Return issue keywords regex for raw bytes (for lowercased bytes if
+    # keywords all plain words, for decoded lines if not ASCII), lowercase
+    # keywords if plain words, whether lines can be found by searching whole
+    # blocks, number of issue templates to keep counts of (None to count all
+    # issues), whether to collect keyword, offsets of each issue and since,
+    # until times of lines to count (None to count all lines)
+    pattern = regex.pattern
+    if not pattern.isascii():
+        # Bytes regexes only ignore case of ASCII letters, match text
+        return regex, None, False, top_k, details, window
+    regex_bytes = re.compile(pattern.encode(), regex.flags & ~re.UNICODE)
+    keywords = pattern.split("|")
+    literals = None
+    if regex.flags & re.IGNORECASE and \
+            all(LITERAL_KEYWORD_REGEX.fullmatch(keyword)
+                for keyword in keywords):
+        literals = tuple(keyword.lower().encode() for keyword in keywords)
+        # Match plain words in lowercased lines, faster than ignoring case
+        regex_bytes = re.compile(b"|".join(literals))
+    prefilter = UNSAFE_PREFILTER_REGEX.search(pattern) is None
+    return regex_bytes, literals, prefilter, top_k, details, window
+
+
+def _get_candidate_lines(log_map, engine, start, end):
+    # Yield byte ranges of lines in log_map[start:end] which may have issues,
+    # log_map being a memory-mapped file or bytes
+    _, literals, prefilter, _, _, _ = engine
+    while start < end:
+        # Search newline-aligned blocks, bounding memory used per block
+        block_end = end
+        if start + SCAN_BLOCK_SIZE < end:
+            block_end = \
+                log_map.find(b"\n", start + SCAN_BLOCK_SIZE, end) + 1 or end
+        if literals is None and not prefilter:
+            # Anchors, lookarounds only apply per column, check every line
+            lines = _find_all_lines(log_map, start, block_end)
+        else:
+            # Search start of block first: if most of its lines match,
+            # searching costs more than checking every line
+            sample_end = block_end
+            if start + DENSITY_SAMPLE_SIZE < block_end:
+                sample_end = log_map.find(
+                    b"\n", start + DENSITY_SAMPLE_SIZE, block_end) + 1 \
+                    or block_end
+            lines = _find_searched_lines(log_map, engine, start, sample_end)
+            lines_sampled = log_map[start:sample_end].count(b"\n") or 1
+            if len(lines) > DENSE_LINES_FRACTION * lines_sampled:
+                lines = _find_all_lines(log_map, start, block_end)
+            elif sample_end < block_end:
+                lines += _find_searched_lines(log_map, engine, sample_end,
+                                              block_end)
+        yield from lines
+        start = block_end
+
+
+def _find_searched_lines(log_map, engine, start, end):
+    # Return byte ranges of lines in log_map[start:end] which may have
+    # issues, found by searching it whole for literals or regex
+    regex, literals, _, _, _, _ = engine
+    if literals is not None:
+        return _find_literal_lines(log_map[start:end].lower(), literals,
+                                   start)
+    return _find_regex_lines(log_map, regex, start, end)
+
+
+def _find_literal_lines(block, literals, offset):
+    # Return sorted byte ranges, from offset, of lines in lowercase block
+    # containing any literal
+    lines = {}
+    for literal in literals:
+        position = block.find(literal)
+        while position != -1:
+            line_start = block.rfind(b"\n", 0, position) + 1
+            line_end = block.find(b"\n", position) + 1 or len(block)
+            lines[line_start + offset] = line_end + offset
+            position = block.find(literal, line_end)
+    return sorted(lines.items())
+
+
+def _find_regex_lines(log_map, regex, start, end):
+    # Return byte ranges of lines in log_map[start:end] matching regex
+    lines = []
+    match = regex.search(log_map, start, end)
+    while match is not None:
+        line_start = log_map.rfind(b"\n", start, match.start()) + 1 or start
+        line_end = log_map.find(b"\n", match.start(), end) + 1 or end
+        lines.append((line_start, line_end))
+        match = regex.search(log_map, line_end, end)
+    return lines
+
+
+def _find_all_lines(log_map, start, end):
+    # Return byte ranges of all lines in log_map[start:end]
+    lines = []
+    while start < end:
+        line_end = log_map.find(b"\n", start, end) + 1 or end
+        lines.append((start, line_end))
+        start = line_end
+    return lines
+
+
+def _count_line_issues(line, line_offset, engine, issues_found,
+                       issues_found_keyword, issues_found_details):
+    # Count columns of line at line_offset matching issue keywords, and their
+    # keywords
+    regex, literals, _, top_k, details, window = engine
+    if not details:
+        issues_found_details = None
+    # Compressed files can't be searched for window, check each line in it
+    if window is not None and not _is_line_in_time_window(line, window):
+        return
+    if literals is not None:
+        # Plain-word matches never span columns, take column around each
+        line_lower = line.lower()
+        match = regex.search(line_lower)
+        while match is not None:
+            col_start = line.rfind(b":", 0, match.start()) + 1
+            col_end = line.find(b":", match.end())
+            if col_end == -1:
+                col_end = len(line)
+            _count_issue(line[col_start:col_end],
+                         line[match.start():match.end()], line_offset, top_k,
+                         issues_found, issues_found_keyword,
+                         issues_found_details)
+            match = regex.search(line_lower, col_end)
+        return
+    if isinstance(regex.pattern, str):
+        for col in line.decode(errors="replace").split(":"):
+            if col:
+                match = regex.search(col.strip())
+                if match is not None:
+                    _count_issue(col.encode(), match.group().encode(),
+                                 line_offset, top_k, issues_found,
+                                 issues_found_keyword, issues_found_details)
+        return
+    for col in line.split(b":"):
+        if col:
+            match = regex.search(col.strip())
+            if match is not None:
+                _count_issue(col, match.group(), line_offset, top_k,
+                             issues_found, issues_found_keyword,
+                             issues_found_details)
+
+
+def _count_issue(col, keyword, line_offset, top_k, issues_found,
+                 issues_found_keyword, issues_found_details):
+    # Add issue if not processed before, else increment count. If top_k,
+    # count issue's template in at most top_k approximate counts instead
+    issue = col.decode(errors="replace").strip()
+    keyword = keyword.decode(errors="replace")
+    issue_replaced = None
+    if top_k is None:
+        issues_found[issue] = issues_found.get(issue, 0) + 1
+    else:
+        issue = _get_issue_template(issue)
+        issue_replaced = _count_top_k(issues_found, issue, top_k)
+    issues_found_keyword[keyword] = issues_found_keyword.get(keyword, 0) + 1
+    if issues_found_details is not None:
+        issues_found_details.pop(issue_replaced, None)
+        details = issues_found_details.get(issue)
+        if details is None:
+            issues_found_details[issue] = [keyword, line_offset, line_offset]
+        else:
+            details[2] = line_offset
+
+
+"""Issue templates"""
+
+
+def _get_issue_template(issue):
+    # Return issue with variable tokens, e.g. PIDs, timestamps, IPs, replaced
+    # by a wildcard, as Drain log template mining treats tokens with digits
+    return TEMPLATE_VARIABLE_REGEX.sub(TEMPLATE_WILDCARD, issue)
+
+
+class _TopKCounts(dict):
+    """Issue counts kept by _count_top_k, with a min-heap of (count, issue),
+    one entry per issue, its count possibly lower than the issue's since"""
+
+    def __init__(self):
+        super().__init__()
+        self.heap = []
+
+
+def _get_issue_counts(engine):
+    # Return empty issue counts for engine, kept by _count_top_k if it
+    # counts templates
+    _, _, _, top_k, _, _ = engine
+    return {} if top_k is None else _TopKCounts()
+
+
+def _count_top_k(issues_dict, issue, top_k):
+    # Count issue in at most top_k counts using Space-Saving: when full, a
+    # new issue replaces the least counted, taking over its count. Counts
+    # over-estimate by at most the least count. The least counted is found
+    # at the top of issues_dict's heap, updating counts there only when
+    # reached, in O(log top_k) amortised. Return issue replaced
+    if issue in issues_dict:
+        issues_dict[issue] += 1
+        return None
+    heap = issues_dict.heap
+    if len(issues_dict) < top_k:
+        issues_dict[issue] = 1
+        heapq.heappush(heap, (1, issue))
+        return None
+    while issues_dict[heap[0][1]] != heap[0][0]:
+        issue_counted = heap[0][1]
+        heapq.heapreplace(heap, (issues_dict[issue_counted], issue_counted))
+    issue_least = heap[0][1]
+    issues_dict[issue] = issues_dict.pop(issue_least) + 1
+    heapq.heapreplace(heap, (issues_dict[issue], issue))
+    return issue_least
+
+
+def _prune_top_k(issues_dict, top_k):
+    # Keep only top_k most counted issues, after merging counts
+    if len(issues_dict) > top_k:
+        issues_kept = sorted(issues_dict.items(), key=lambda item: item[1],
+                             reverse=True)[:top_k]
+        issues_dict.clear()
+        issues_dict.update(issues_kept)
+
+
+"""Issue index"""
+
+
+def _start_index_run(file_index):
+    # Return connection to issue index database, creating it if needed, and
+    # ID of this run's entry in it
+    connection = sqlite3.connect(file_index)
+    connection.executescript(INDEX_SCHEMA)
+    with connection:
+        run_id = connection.execute(
+            "INSERT INTO runs (host, started) VALUES (?, ?)",
+            (socket.gethostname(), datetime.now().isoformat())).lastrowid
+    return connection, run_id
+
+
+def write_index_issues(index, file, issues_found, issues_found_details):
+    # Insert issues found in file in one transaction
+    connection, run_id = index
+    rows = []
+    for issue, count in issues_found.items():
+        keyword, first_offset, last_offset = issues_found_details[issue]
+        rows.append((run_id, os.path.abspath(file), keyword, issue,
+                     _get_issue_template(issue), count, first_offset,
+                     last_offset))
+    with connection:
+        connection.executemany(
+            "INSERT INTO issues (run_id, file, keyword, issue, template, "
+            "count, first_offset, last_offset) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def query_index_issues(file_index, query, since):
+    # Return hosts, files with issues of keyword or template query in runs
+    # since ISO8601 since, with total count and first, last run seen in
+    connection = sqlite3.connect(file_index)
+    connection.executescript(INDEX_SCHEMA)
+    rows = connection.execute(
+        "SELECT runs.host, issues.file, SUM(issues.count), MIN(runs.started), "
+        "MAX(runs.started) FROM issues JOIN runs ON issues.run_id = runs.id "
+        "WHERE (issues.keyword = ? COLLATE NOCASE OR issues.template = ?) "
+        "AND runs.started >= ? GROUP BY runs.host, issues.file "
+        "ORDER BY SUM(issues.count) DESC", (query, query, since)).fetchall()
+    connection.close()
+    return rows
+
+
+def _print_index_query(file_index, query, since):
+    # Print result of issue index query
+    for host, file, count, first_run, last_run in \
+            query_index_issues(file_index, query, since):
+        print(f"{host} {file}: {query} appeared {count} times in runs from "
+              f"{first_run} to {last_run}")
+
+
+"""Scanner API"""
+
+
+class LogScanner:
+    """Scanner of log files for issue keywords, compiling its rules once to
+    scan any number of files in-process, keeping checkpoints of files scanned
+    incrementally in memory
+
+    Keywords are matched case-insensitive as with -k. templates, top_k,
+    since and until (datetimes), jobs and chunk_size (bytes) are as with -t,
+    --top-k, --since, --until, -j and -c
+    """
+
+    def __init__(self, keywords=None, templates=False, top_k=TOP_K,
+                 since=None, until=None, jobs=1, chunk_size=CHUNK_SIZE):
+        if keywords is None:
+            regex = re.compile(ISSUES_ARG_DEFAULT, re.IGNORECASE)
+        else:
+            regex = _get_issues_regex(keywords)
+        window = (since, until) \
+            if since is not None or until is not None else None
+        self.top_k = top_k if templates else None
+        self.engine = _get_match_engine(regex, self.top_k, False, window)
+        self.chunk_size = chunk_size
+        self.checkpoints = {}
+        self.checkpoints_by_inode = {}
+        self.executor = ProcessPoolExecutor(max_workers=jobs) \
+            if jobs > 1 else None
+
+    def scan(self, path, incremental=False, since=None, until=None):
+        """Return issues and issue keywords found in log file with their
+        counts. If incremental, only scans complete lines appended since the
+        last incremental scan of file, returning counts of all its scans.
+        since and until (datetimes), if given, replace the scanner's for
+        this scan
+
+        Raises OSError (e.g. PermissionError) if file cannot be read
+        """
+        path = Path(path)
+        engine = self.engine
+        if since is not None or until is not None:
+            regex, literals, prefilter, top_k, details, window = engine
+            since_scanner, until_scanner = window or (None, None)
+            engine = (regex, literals, prefilter, top_k, details,
+                      (since if since is not None else since_scanner,
+                       until if until is not None else until_scanner))
+        if incremental:
+            scan = _start_log_scan(path, engine, self.checkpoints,
+                                   self.checkpoints_by_inode, self.executor,
+                                   True, self.chunk_size)
+        else:
+            scan = _start_log_scan(path, engine, {}, {}, self.executor,
+                                   False, self.chunk_size)
+        if scan is None:
+            raise PermissionError(f"Permission denied: '{path}'")
+        checkpoint, range_scans, _ = scan
+        issues_new, issues_new_keyword, _ = _get_scan_issues(range_scans)
+        _add_checkpoint_issues(checkpoint, issues_new, issues_new_keyword,
+                               self.top_k)
+        if incremental:
+            self.checkpoints[os.path.abspath(path)] = checkpoint
+            self.checkpoints_by_inode[checkpoint["inode"]] = checkpoint
+        return _sort_issues(checkpoint["issues"]), \
+            _sort_issues(checkpoint["issues_keyword"])
+
+    def close(self):
+        """Stop processes scanning in parallel, if any"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 """Helpers"""
@@ -275,6 +1580,24 @@ def get_list_from_comma_separated_string(string):
     return [word for word in words]
 
 
+def _merge_issues(issues_dict, issues_to_add):
+    for issue, count in issues_to_add.items():
+        issues_dict[issue] = issues_dict.get(issue, 0) + count
+
+
+def _merge_issue_details(details_dict, details_to_add):
+    # Keep keyword, offset of earliest first, latest last line of each issue
+    for issue, details in details_to_add.items():
+        details_merged = details_dict.get(issue)
+        if details_merged is None:
+            details_dict[issue] = list(details)
+        elif details[1] < details_merged[1]:
+            details_dict[issue] = [details[0], details[1],
+                                   max(details[2], details_merged[2])]
+        else:
+            details_merged[2] = max(details[2], details_merged[2])
+
+
 def _sort_issues(issues_dict):
     return {key: value for key, value in sorted(
         issues_dict.items(), key=lambda item: item[1], reverse=True)}
@@ -291,14 +1614,20 @@ def main():
     global ISSUES_REGEX
 
     get_flag_arguments()
+    if QUERY is not NONE and FILE_INDEX is not NONE:
+        _print_index_query(FILE_INDEX, QUERY, QUERY_SINCE)
+        return
     _set_source_dir()
     _set_issue_keywords()
     _set_files_to_parse()
     _create_dest_dir(DIR_DEST)
-    FILES_LOGS_PATHS = _set_abs_log_file_paths(NAMES_FILES_TO_PARSE)
-    FILES_LOGS_PATHS = _remove_nonexistent_files(FILES_LOGS_PATHS)
-    _iterate_check_each_file(FILES_LOGS_PATHS, ISSUES_REGEX)
+    FILES_LOGS_PATHS = _get_log_file_paths()
+    if FOLLOW:
+        _follow_each_file(FILES_LOGS_PATHS, ISSUES_REGEX)
+    else:
+        _iterate_check_each_file(FILES_LOGS_PATHS, ISSUES_REGEX)
     _delete_dir_if_empty(DIR_DEST)
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""Serve log_reader.py scans over a Unix socket, keeping a LogScanner warm for
+each set of rules requested so scans need no process start, argument parsing
+or pattern compiling.
+
+Requests and responses are single lines of JSON. A request has "files" to
+scan, and optionally "keywords", "templates", "top_k", "since", "until" (as
+with log_reader.py's flags) and "incremental". The response has "files", the
+issues and issue keywords found in each file with their counts, or the
+"error" it could not be read with.
+
+Examples:
+    `python3 scan_daemon.py` serves scans on ./log_reader.sock until
+    interrupted
+
+    `python3 scan_daemon.py -s /run/log_reader.sock -j 4` serves scans on
+    /run/log_reader.sock, scanning large files in 4 parallel processes
+
+    `python3 scan_daemon.py -c -k error,failed /var/log/syslog` sends a scan
+    request for /var/log/syslog to the daemon, printing its response
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import re
+import socket
+import socketserver
+import threading
+
+import log_reader
+
+# Global variables: based on flags
+FILE_SOCKET = Path("./log_reader.sock")
+JOBS = 1
+CLIENT = False
+KEYWORDS = None
+FILES_CLIENT = []
+INCREMENTAL = False
+
+# Global variables: general
+# Most scanners kept warm, least recently used dropped first
+SCANNERS_MAX = 16
+SCANNERS = {}
+SCANNERS_LOCK = threading.Lock()
+
+"""Setup"""
+
+
+def _get_flag_arguments():
+    global FILE_SOCKET
+    global JOBS
+    global CLIENT
+    global KEYWORDS
+    global FILES_CLIENT
+    global INCREMENTAL
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--socket", type=str,
+                        help="path of Unix socket to serve scans on "
+                             "(default: ./log_reader.sock)")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="number of processes each scanner scans large "
+                             "files in (default: 1)")
+    parser.add_argument("-c", "--client", action="store_true",
+                        help="send scan request for files to daemon instead "
+                             "of serving")
+    parser.add_argument("-k", "--keywords", type=str,
+                        help="with --client, issue keywords to look for, "
+                             "comma-separated")
+    parser.add_argument("-i", "--incremental", action="store_true",
+                        help="with --client, only scan bytes appended since "
+                             "the daemon's last incremental scan")
+    parser.add_argument("files", nargs="*",
+                        help="with --client, log files to scan")
+    args = parser.parse_args()
+
+    if args.socket:
+        FILE_SOCKET = Path(args.socket)
+    if args.jobs:
+        JOBS = max(args.jobs, 1)
+    if args.client:
+        CLIENT = args.client
+    if args.keywords:
+        KEYWORDS = log_reader.get_list_from_comma_separated_string(
+            args.keywords)
+    if args.incremental:
+        INCREMENTAL = args.incremental
+    FILES_CLIENT = args.files
+
+
+"""Serve scans"""
+
+
+class ScanRequestHandler(socketserver.StreamRequestHandler):
+    """Handler answering each line of JSON read from a connection with a
+    line of JSON"""
+
+    def handle(self):
+        for request_line in self.rfile:
+            try:
+                response = _get_scan_response(json.loads(request_line))
+            except (ValueError, TypeError, KeyError, re.error) as error:
+                response = {"error": f"Invalid request: {error}"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+def _get_scan_response(request):
+    # Return issues found in each file of request, by scanner for its rules.
+    # Times relative to now, e.g. 2h, are taken as of this request
+    scanner, scanner_lock = _get_scanner(
+        tuple(request["keywords"]) if request.get("keywords") else None,
+        bool(request.get("templates")),
+        request.get("top_k", log_reader.TOP_K))
+    since = log_reader._get_time_from_arg(request["since"]) \
+        if request.get("since") else None
+    until = log_reader._get_time_from_arg(request["until"]) \
+        if request.get("until") else None
+    incremental = bool(request.get("incremental"))
+    files = {}
+    # Scanners keep checkpoints, scan with one request at a time
+    with scanner_lock:
+        for file in request["files"]:
+            try:
+                issues, issues_keyword = scanner.scan(file, incremental,
+                                                      since, until)
+                files[file] = {"issues": issues,
+                               "issues_keyword": issues_keyword}
+            except OSError as error:
+                files[file] = {"error": str(error)}
+    return {"files": files}
+
+
+def _get_scanner(keywords, templates, top_k):
+    # Return scanner for rules, and lock to scan with, compiling it if not
+    # kept warm
+    key = (keywords, templates, top_k)
+    with SCANNERS_LOCK:
+        if key in SCANNERS:
+            # Move to end as most recently used
+            SCANNERS[key] = SCANNERS.pop(key)
+            return SCANNERS[key]
+        scanner = log_reader.LogScanner(keywords, templates, top_k,
+                                        jobs=JOBS)
+        scanner_entry = SCANNERS[key] = (scanner, threading.Lock())
+        scanner_oldest = None
+        if len(SCANNERS) > SCANNERS_MAX:
+            scanner_oldest = SCANNERS.pop(next(iter(SCANNERS)))
+    # Close evicted scanner once its last scan finishes, outside the global
+    # lock so requests for other scanners are not held up meanwhile
+    if scanner_oldest is not None:
+        scanner_oldest, scanner_oldest_lock = scanner_oldest
+        with scanner_oldest_lock:
+            scanner_oldest.close()
+    return scanner_entry
+
+
+def serve_scans(file_socket):
+    # Serve scan requests on Unix socket until interrupted
+    if file_socket.is_socket():
+        file_socket.unlink()
+    with socketserver.ThreadingUnixStreamServer(
+            str(file_socket), ScanRequestHandler) as server:
+        print(f"Serving scans on {file_socket}, interrupt to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Stopped serving scans")
+        finally:
+            file_socket.unlink()
+            for scanner, _ in SCANNERS.values():
+                scanner.close()
+
+
+"""Request scans"""
+
+
+def request_scan(file_socket, request):
+    """Return daemon's response to scan request"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client, \
+            client.makefile("rwb") as stream:
+        client.connect(str(file_socket))
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+"""Entry point"""
+
+
+def main():
+    _get_flag_arguments()
+    if CLIENT:
+        request = {"files": [os.path.abspath(file) for file in FILES_CLIENT],
+                   "keywords": KEYWORDS, "incremental": INCREMENTAL}
+        print(json.dumps(request_scan(FILE_SOCKET, request), indent=4))
+    else:
+        serve_scans(FILE_SOCKET)
+
+
+if __name__ == "__main__":
+    main()